@@ -0,0 +1,23 @@
+import pytest
+from django.test.utils import override_settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_cache(tmp_path_factory):
+    """Кеш тестов во временном каталоге, как в TemporaryCacheRunner."""
+    from core.runner import temporary_caches
+
+    directory = str(tmp_path_factory.mktemp('cache'))
+    with override_settings(CACHES=temporary_caches(directory)):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(temporary_cache):
+    """Каждый тест начинается с пустого кеша."""
+    from django.core.cache import cache
+
+    from core.cache import local
+
+    cache.clear()
+    local.clear()
@@ -0,0 +1,325 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .routers import state
+
+GENERATION_PREFIX = 'generation:'
+STATS_PREFIX = 'cache_stats:'
+PAGE_PREFIX = 'page:'
+SURROGATE_PREFIX = 'surrogate:'
+SURROGATE_HEADER = 'Surrogate-Key'
+PAGE = 'page'
+OBJECT_PREFIX = 'object:'
+LEASE_PREFIX = 'lease:'
+
+
+def incr(key, delta=1):
+    """cache.incr, создающий ключ при первом обращении."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_generations(*scopes):
+    """Текущие поколения областей кеша.
+
+    Начальное значение берется от часов: если ключ поколения вытеснен,
+    новое значение не совпадет ни с одним из уже выданных.
+    """
+    keys = {GENERATION_PREFIX + scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = set(keys) - set(found)
+    if missing:
+        initial = time.time_ns()
+        for key in missing:
+            cache.add(key, initial, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: value for key, value in found.items()}
+
+
+def bump(*scopes):
+    """Сменить поколение областей: все ключи с ними становятся устаревшими."""
+    local.evict(*scopes)
+    for scope in set(scopes):
+        key = GENERATION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def version_of(*scopes):
+    """Короткая строка, меняющаяся при смене поколения любой из областей."""
+    generations = get_generations(*scopes)
+    raw = ':'.join(f'{scope}={generations[scope]}' for scope in sorted(
+        generations))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def record(name, hit, count=1):
+    """Учесть попадания или промахи кеша с именем name."""
+    if not count:
+        return
+    count_event(name, 'hits' if hit else 'misses', count)
+
+
+def count_event(name, event, count=1):
+    key = f'{STATS_PREFIX}{name}:{event}'
+    if incr(key, count) == count:
+        names = cache.get(STATS_PREFIX + 'names', set())
+        cache.set(STATS_PREFIX + 'names', names | {name}, None)
+
+
+def tracked_names():
+    local.flush_stats()
+    return sorted(cache.get(STATS_PREFIX + 'names', set()))
+
+
+def get_stats(name):
+    """Попадания, промахи, устаревшие ответы и сбросы кеша name.
+
+    Счетчики, накопленные в этом процессе, сначала сбрасываются в общий
+    кеш; счетчики других процессов видны после их сброса.
+    """
+    local.flush_stats()
+    events = ('hits', 'misses', 'stale', 'purges')
+    found = cache.get_many([f'{STATS_PREFIX}{name}:{e}' for e in events])
+    stats = {e: found.get(f'{STATS_PREFIX}{name}:{e}', 0) for e in events}
+    total = stats['hits'] + stats['misses']
+    stats['ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def add_surrogate_keys(response, *keys):
+    """Пометить ответ суррогатными ключами для сброса через purge."""
+    found = set(response.get(SURROGATE_HEADER, '').split())
+    response[SURROGATE_HEADER] = ' '.join(sorted(found | set(keys)))
+    return response
+
+
+def purge(*keys):
+    """Сбросить все страницы, помеченные любым из ключей."""
+    keys = set(keys)
+    bump(*(SURROGATE_PREFIX + key for key in keys))
+    count_event(PAGE, 'purges', len(keys))
+
+
+def page_key(request):
+    url = request.build_absolute_uri()
+    return PAGE_PREFIX + hashlib.md5(url.encode()).hexdigest()
+
+
+def get_page(key):
+    """Ответ из кеша страниц и признак свежести.
+
+    Страница с уже сброшенными ключами возвращается как несвежая: ее
+    можно отдать, пока другой процесс перерисовывает страницу.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None, False
+    scopes = [SURROGATE_PREFIX + key for key in entry['keys']]
+    fresh = get_generations(*scopes) == entry['generations']
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    return response, fresh
+
+
+def set_page(key, response):
+    """Сохранить ответ вместе с текущими поколениями его ключей."""
+    keys = response[SURROGATE_HEADER].split()
+    cache.set(key, {
+        'keys': keys,
+        'generations': get_generations(
+            *(SURROGATE_PREFIX + key for key in keys)),
+        'content': response.content,
+        'status': response.status_code,
+        'headers': list(response.items()),
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+def acquire_lease(key):
+    """Право пересчитать key; его получает только один процесс."""
+    return cache.add(LEASE_PREFIX + key, True, settings.CACHE_LEASE_TIMEOUT)
+
+
+def release_lease(key):
+    cache.delete(LEASE_PREFIX + key)
+
+
+def is_fresh(entry, version):
+    """Запись актуальна и не выпала на досрочный пересчет.
+
+    Досрочный пересчет (XFetch): чем ближе срок и дольше пересчет, тем
+    вероятнее, что запрос обновит значение заранее, до истечения.
+    """
+    if entry is None or entry['version'] != version:
+        return False
+    early = entry['delta'] * settings.CACHE_XFETCH_BETA * math.log(
+        1 - random.random())
+    return time.time() - early < entry['expires']
+
+
+def is_pinned():
+    """Запрос закреплен за основной базой после своей записи.
+
+    Запись в кеше под новым поколением мог собрать запрос, читавший
+    отстающую реплику, поэтому такой запрос кеш не читает, а
+    пересчитывает значение по основной базе и перезаписывает его.
+    """
+    return getattr(state, 'pinned', False)
+
+
+def store_entry(key, version, compute, timeout):
+    started = time.time()
+    value = compute()
+    now = time.time()
+    entry = {
+        'version': version,
+        'value': value,
+        'delta': now - started,
+        'expires': now + timeout,
+    }
+    cache.set(key, entry, timeout + settings.CACHE_STALE_TIMEOUT)
+    local.set(key, entry)
+    return value
+
+
+def get_or_compute(key, version, compute, timeout, name):
+    """Значение key для version; пересчитывает его один процесс.
+
+    Запись хранится дольше своего срока на CACHE_STALE_TIMEOUT. Пока
+    владелец аренды считает новое значение, остальные отдают старое;
+    если старого нет, ждут его результата до CACHE_LEASE_WAIT секунд.
+    """
+    if is_pinned():
+        local.record(name, False)
+        return store_entry(key, version, compute, timeout)
+    entry = local.get(key)
+    fresh = is_fresh(entry, version)
+    local.record(f'local:{name}', fresh)
+    if fresh:
+        return entry['value']
+    entry = cache.get(key) or entry
+    if is_fresh(entry, version):
+        local.record(name, True)
+        local.set(key, entry)
+        return entry['value']
+    leased = acquire_lease(key)
+    if not leased and entry is not None:
+        local.count_event(name, 'stale')
+        return entry['value']
+    if not leased:
+        deadline = time.monotonic() + settings.CACHE_LEASE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None and entry['version'] == version:
+                local.record(name, True)
+                return entry['value']
+    local.record(name, False)
+    try:
+        return store_entry(key, version, compute, timeout)
+    finally:
+        if leased:
+            release_lease(key)
+
+
+class LocalCache:
+    """Небольшой LRU в памяти процесса перед общим кешем.
+
+    Запись живет LOCAL_CACHE_TIMEOUT секунд. Счетчики кешей процесса
+    копятся здесь и сбрасываются в общий кеш пачками по LOCAL_STATS_FLUSH:
+    запись каждого попадания в общий кеш стоила бы записи в SQLite.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.entries.get(key, (None, 0))
+            if expires < time.monotonic():
+                self.entries.pop(key, None)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (
+                value, time.monotonic() + settings.LOCAL_CACHE_TIMEOUT)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.LOCAL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def evict(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.counts.clear()
+
+    def record(self, name, hit, count=1):
+        self.count_event(name, 'hits' if hit else 'misses', count)
+
+    def count_event(self, name, event, count=1):
+        if not count:
+            return
+        with self.lock:
+            self.counts[name, event] += count
+            full = sum(self.counts.values()) >= settings.LOCAL_STATS_FLUSH
+        if full:
+            self.flush_stats()
+
+    def flush_stats(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        for (name, event), count in counts.items():
+            count_event(name, event, count)
+
+
+local = LocalCache()
+
+
+def cached_object(scope, load):
+    """Объект из двух уровней кеша: памяти процесса и общего.
+
+    Ключ в общем кеше содержит поколение scope, поэтому bump(scope)
+    сразу вытесняет объект в своем процессе и не позже чем через
+    LOCAL_CACHE_TIMEOUT — в остальных. load вызывается при промахе
+    обоих уровней или для запроса, закрепленного за основной базой;
+    исключение из него (например, Http404) не кешируется.
+    """
+    kind = scope.split(':')[0]
+    pinned = is_pinned()
+    if not pinned:
+        value = local.get(scope)
+        local.record(f'local:{kind}', value is not None)
+        if value is not None:
+            return value
+    key = f'{OBJECT_PREFIX}{scope}:{get_generations(scope)[scope]}'
+    value = None if pinned else cache.get(key)
+    local.record(f'shared:{kind}', value is not None)
+    if value is None:
+        value = load()
+        cache.set(key, value, settings.OBJECT_CACHE_TIMEOUT)
+    local.set(scope, value)
+    return value
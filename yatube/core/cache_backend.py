@@ -0,0 +1,196 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+# Время последнего чтения обновляется не чаще раза в TOUCH_INTERVAL
+# секунд: иначе каждое чтение превращалось бы в запись.
+TOUCH_INTERVAL = 60
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кеш в файле SQLite в режиме WAL.
+
+    LOCATION — путь к файлу. Ключи с истекшим сроком не отдаются и
+    удаляются при отсечении. Если записей больше MAX_ENTRIES, удаляется
+    1/CULL_FREQUENCY давно не читанных.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        # Соединение на поток; после fork рабочий процесс открывает свое.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.location, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE: запись берет блокировку сразу, без дедлоков."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def dumps(value):
+        # Целые хранятся как есть, чтобы incr оставался одним UPDATE.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def expires(self, timeout):
+        # get_backend_timeout уже возвращает момент истечения или None.
+        return self.get_backend_timeout(timeout)
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        marks = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({marks}) AND {ALIVE}',
+            [*keys, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - TOUCH_INTERVAL]
+        if stale:
+            self.connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                [now, *stale],
+            )
+        return {keys[key]: self.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.expires(timeout)
+        rows = [
+            (self.key(key, version), self.dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows)
+            self.cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self.transaction() as connection:
+            added = connection.execute(
+                'INSERT INTO cache VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires, accessed = excluded.accessed '
+                'WHERE cache.expires <= ?',
+                (self.key(key, version), self.dumps(value),
+                 self.expires(timeout), now, now),
+            ).rowcount
+            self.cull(connection, now)
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарный incr одним UPDATE; нет ключа — ValueError."""
+        key = self.key(key, version)
+        with self.transaction() as connection:
+            updated = connection.execute(
+                f'UPDATE cache SET value = value + ? '
+                f"WHERE key = ? AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, key, time.time()),
+            ).rowcount
+            value = connection.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        if not updated:
+            raise ValueError(f"Key '{key}' not found")
+        return value[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self.connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.expires(timeout), self.key(key, version), time.time()),
+        ).rowcount)
+
+    def has_key(self, key, version=None):
+        return self.connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self.key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.key(key, version) for key in keys]
+        if keys:
+            marks = ', '.join('?' * len(keys))
+            self.connection.execute(
+                f'DELETE FROM cache WHERE key IN ({marks})', keys)
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def cull(self, connection, now):
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency, count - self._max_entries),),
+        )
+
+    def close(self, **kwargs):
+        # Соединение живет, пока жив поток: открывать файл на каждый
+        # запрос дороже, чем держать его открытым.
+        pass
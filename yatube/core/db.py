@@ -0,0 +1,68 @@
+import random
+import threading
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Замок записи общий для потоков процесса: запросы на запись ждут друг
+# друга в Python, а не в SQLite, где ожидание ограничено busy_timeout.
+write_lock = threading.RLock()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Применить прагмы к каждому новому соединению SQLite.
+
+    Берутся PRAGMAS из настроек базы, а если их нет — SQLITE_PRAGMAS.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS', settings.SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    message = str(error)
+    return 'database is locked' in message or 'table is locked' in message
+
+
+def retry_locked(func, connection=connection):
+    """Выполнить func под замком записи, повторяя ее при блокировке базы.
+
+    Повторов не больше SQLITE_WRITE_RETRIES, паузы растут вдвое от
+    SQLITE_RETRY_DELAY. Внутри уже открытой транзакции повторять нечего:
+    ошибка уходит наверх, к тому, кто транзакцию открыл.
+    """
+    if connection.in_atomic_block:
+        with write_lock:
+            return func()
+    delay = settings.SQLITE_RETRY_DELAY
+    for _ in range(settings.SQLITE_WRITE_RETRIES):
+        try:
+            with write_lock:
+                return func()
+        except OperationalError as error:
+            if not is_locked(error):
+                raise
+        time.sleep(delay * random.uniform(1, 2))
+        delay *= 2
+    with write_lock:
+        return func()
+
+
+def serialized_write(func):
+    """Декоратор для представлений и функций, пишущих в базу.
+
+    Ставится снаружи transaction.atomic, чтобы повтор начинал
+    транзакцию заново.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return retry_locked(partial(func, *args, **kwargs))
+    return wrapper
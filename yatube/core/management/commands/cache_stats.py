@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats, tracked_names
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кешей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Имена кешей; по умолчанию все, что уже встречались.',
+        )
+
+    def handle(self, *args, **options):
+        for name in options['names'] or tracked_names():
+            stats = get_stats(name)
+            self.stdout.write(
+                f'{name}: hits={stats["hits"]} misses={stats["misses"]} '
+                f'ratio={stats["ratio"]:.2%} stale={stats["stale"]} '
+                f'purges={stats["purges"]}'
+            )
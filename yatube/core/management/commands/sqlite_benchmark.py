@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from core.db import retry_locked
+
+ALIAS = 'benchmark'
+PAYLOAD = 'x' * 200
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def insert():
+    # Чтение перед записью, как в get_or_create: отложенная транзакция
+    # SQLite должна повысить блокировку, и тут конкуренты мешают больше.
+    with transaction.atomic(using=ALIAS):
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM benchmark')
+            cursor.execute(
+                'INSERT INTO benchmark (payload) VALUES (%s)', [PAYLOAD])
+
+
+def serialized_insert():
+    return retry_locked(insert, connections[ALIAS])
+
+
+def select():
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute(
+            'SELECT payload FROM benchmark ORDER BY id DESC LIMIT 20')
+        cursor.fetchall()
+
+
+def run(operation, deadline):
+    """Повторять operation до deadline; задержки и число ошибок."""
+    latencies, errors = [], 0
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                operation()
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.monotonic() - started)
+    finally:
+        connections[ALIAS].close()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает временную базу SQLite параллельными записями и '
+        'чтениями и печатает пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Сколько секунд длится нагрузка.',
+        )
+        parser.add_argument(
+            '--plain', action='store_true',
+            help='Без прагм и замка записи, для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+        }
+        if options['plain']:
+            database['PRAGMAS'] = {}
+        connections.databases[ALIAS] = database
+        try:
+            with connections[ALIAS].cursor() as cursor:
+                cursor.execute(
+                    'CREATE TABLE benchmark '
+                    '(id INTEGER PRIMARY KEY, payload TEXT NOT NULL)')
+            connections[ALIAS].close()
+            self.report(options, *self.load(options))
+        finally:
+            del connections.databases[ALIAS]
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def load(self, options):
+        write = insert if options['plain'] else serialized_insert
+        deadline = time.monotonic() + options['duration']
+        workers = options['writers'] + options['readers']
+        with ThreadPoolExecutor(workers) as pool:
+            writes = [
+                pool.submit(run, write, deadline)
+                for _ in range(options['writers'])
+            ]
+            reads = [
+                pool.submit(run, select, deadline)
+                for _ in range(options['readers'])
+            ]
+            writes = [future.result() for future in writes]
+            reads = [future.result() for future in reads]
+        return writes, reads
+
+    def report(self, options, writes, reads):
+        duration = options['duration']
+        mode = 'без настройки' if options['plain'] else 'с настройкой'
+        write_latencies = [t for latencies, _ in writes for t in latencies]
+        write_errors = sum(errors for _, errors in writes)
+        read_count = sum(len(latencies) for latencies, _ in reads)
+        read_errors = sum(errors for _, errors in reads)
+        self.stdout.write(
+            f'Режим {mode}: писателей {options["writers"]}, '
+            f'читателей {options["readers"]}, {duration:g} с.'
+        )
+        self.stdout.write(
+            f'Записей: {len(write_latencies)} '
+            f'({len(write_latencies) / duration:.0f}/с), '
+            f'ошибок: {write_errors}, задержка p50/p99: '
+            f'{percentile(write_latencies, 0.5) * 1000:.1f}/'
+            f'{percentile(write_latencies, 0.99) * 1000:.1f} мс.'
+        )
+        self.stdout.write(
+            f'Чтений: {read_count} ({read_count / duration:.0f}/с), '
+            f'ошибок: {read_errors}.'
+        )
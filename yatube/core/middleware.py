@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import (PAGE, SURROGATE_HEADER, acquire_lease, get_page, local,
+                    page_key, release_lease, set_page)
+from .routers import state
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеш целых страниц для анонимных читателей.
+
+    Сохраняются только ответы с заголовком Surrogate-Key; запись
+    устаревает, как только любой из ее ключей сброшен через purge.
+    Перерисовывает устаревшую страницу один запрос, остальные до его
+    ответа получают прежнюю.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.can_serve(request):
+            return self.get_response(request)
+        key = page_key(request)
+        cached, fresh = get_page(key)
+        leased = not fresh and acquire_lease(key)
+        if cached is not None and (fresh or not leased):
+            # Несвежую страницу отдаем, пока ее перерисовывает другой.
+            if fresh:
+                local.record(PAGE, True)
+            else:
+                local.count_event(PAGE, 'stale')
+            return self.conditional(request, cached)
+        try:
+            response = self.get_response(request)
+            if self.can_store(request, response):
+                local.record(PAGE, False)
+                set_page(key, response)
+        finally:
+            if leased:
+                release_lease(key)
+        return response
+
+    @staticmethod
+    def conditional(request, response):
+        # Сохраненный ETag по-прежнему позволяет ответить 304.
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')),
+            response=response,
+        )
+
+    @staticmethod
+    def can_serve(request):
+        return (
+            settings.PAGE_CACHE_TIMEOUT
+            and request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+        )
+
+    @staticmethod
+    def can_store(request, response):
+        # Страница с csrf-токеном или новыми куками личная.
+        return (
+            response.status_code == 200
+            and SURROGATE_HEADER in response
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
+
+
+class ReplicaPinMiddleware:
+    """Чтение своих записей при чтении с реплик.
+
+    Если в запросе была запись, ответ ставит куку REPLICA_PIN_COOKIE на
+    REPLICA_PIN_SECONDS. Пока она жива, все чтения пользователя идут в
+    основную базу, и после перенаправления он видит то, что записал,
+    даже если реплика отстает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote, state.wrote, state.pinned = state.wrote, False, False
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище по содержимому и число ссылок на него."""
+    name = models.CharField('Путь', max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
@@ -0,0 +1,53 @@
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Состояние запроса в потоке: разрешены ли чтения с реплики, закреплен
+# ли пользователь за основной базой и была ли в запросе запись.
+state = threading.local()
+
+
+class ReplicaRouter:
+    """Чтения из представлений с read_from_replica идут на реплики.
+
+    Реплики перечислены в DATABASE_REPLICAS; пока список пуст, все
+    запросы идут в default. Запись всегда идет в default, даже для
+    объекта, прочитанного с реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (replicas and getattr(state, 'replica', False)
+                and not getattr(state, 'pinned', False)):
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def read_from_replica(view):
+    """Разрешить представлению читать с реплик."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        previous, state.replica = getattr(state, 'replica', False), True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = previous
+    return wrapper
@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def temporary_caches(directory):
+    """CACHES с прежними настройками, но с файлами в directory."""
+    return {
+        alias: {
+            **options,
+            'LOCATION': os.path.join(
+                directory, os.path.basename(options['LOCATION'])),
+        }
+        for alias, options in settings.CACHES.items()
+    }
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    """Тесты пишут кеш во временный каталог.
+
+    Иначе они читают и сбрасывают cache.sqlite3 разработчика, а страницы
+    из прошлого запуска попадают в следующий.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        self.cache_settings = override_settings(
+            CACHES=temporary_caches(self.cache_dir))
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .db import write_lock
+from .models import StoredFile
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище с именами по sha256 содержимого.
+
+    Файлы раскладываются по вложенным каталогам: upload_to/ab/cd/abcd….ext.
+
+    Одинаковое содержимое хранится один раз: повторная загрузка
+    возвращает путь уже лежащего файла.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], digest[2:4], digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # Один и тот же файл могут сохранять параллельно: запись идет во
+        # временное имя, а переименование атомарно заменяет копию-близнеца.
+        partial = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(partial), self.path(name))
+        return name
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+def retain(name, count=1):
+    """Добавить count ссылок на файл хранилища."""
+    if not name or not is_hashed(name):
+        return
+    stored = StoredFile.objects.filter(name=name)
+    if stored.update(refcount=F('refcount') + count):
+        return
+    _, created = StoredFile.objects.get_or_create(
+        name=name, defaults={'refcount': count})
+    if not created:
+        stored.update(refcount=F('refcount') + count)
+
+
+def release(name, storage):
+    """Убрать ссылку; файл без ссылок удаляется после коммита.
+
+    Файлы старой плоской раскладки не учитываются и не удаляются.
+    """
+    if not name or not is_hashed(name):
+        return
+    StoredFile.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1)
+    if StoredFile.objects.filter(name=name, refcount=0).delete()[0]:
+        transaction.on_commit(lambda: delete_unreferenced(name, storage))
+
+
+def delete_unreferenced(name, storage):
+    """Удалить файл, если на него так и не появилось новых ссылок.
+
+    Между release и коммитом тот же файл мог загрузить кто-то еще: его
+    строка уже есть, и файл нужен живым.
+    """
+    with write_lock:
+        if not StoredFile.objects.filter(name=name).exists():
+            storage.delete(name)
@@ -0,0 +1,52 @@
+from django import template
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import get_or_compute
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on, version):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = self.version and self.version.resolve(context)
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            version,
+            lambda: self.nodelist.render(context),
+            settings.FEED_CACHE_TIMEOUT,
+            f'fragment:{self.fragment_name}',
+        )
+
+
+@register.tag
+def fragmentcache(parser, token):
+    """Кеширует фрагмент с защитой от одновременного пересчета.
+
+    {% fragmentcache index_page page_number version=feed_version %}
+
+    Ключ задают имя и vary_on, актуальность — version: при новой версии
+    фрагмент пересчитывает один запрос, остальные отдают прежний.
+    """
+    nodelist = parser.parse(('endfragmentcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 1 argument.")
+    version = None
+    if tokens[-1].startswith('version='):
+        version = parser.compile_filter(tokens.pop()[len('version='):])
+    return FragmentCacheNode(
+        nodelist,
+        tokens[1],
+        [parser.compile_filter(token) for token in tokens[2:]],
+        version,
+    )
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..cache_backend import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared(self):
+        """Запись видна другому экземпляру кеша на том же файле."""
+        self.cache.set_many({'a': 1, 'b': {'text': 'тест'}})
+        self.assertEqual(
+            self.make_cache().get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': {'text': 'тест'}},
+        )
+
+    def test_incr_is_atomic(self):
+        """Параллельные incr не теряют приращений."""
+        self.cache.set('counter', 0)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: self.cache.incr('counter'), range(200)))
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_keys_are_gone(self):
+        """Ключ с истекшим сроком не отдается и снова доступен для add."""
+        self.cache.set('key', 'old', 10)
+        self.assertFalse(self.cache.add('key', 'new'))
+        with mock.patch('time.time', return_value=time.time() + 11):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertTrue(self.cache.add('key', 'new'))
+            self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_cull_drops_least_recently_read(self):
+        """Сверх MAX_ENTRIES удаляются давно не читанные ключи."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        now = time.time()
+        for i, key in enumerate('abc'):
+            with mock.patch('time.time', return_value=now + i * 100):
+                cache.set(key, key, None)
+        with mock.patch('time.time', return_value=now + 300):
+            cache.get('a')
+        with mock.patch('time.time', return_value=now + 400):
+            cache.set('d', 'd', None)
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'c', 'd']),
+            {'a': 'a', 'c': 'c', 'd': 'd'},
+        )
+
+
+class CacheLocationTest(SimpleTestCase):
+    def test_tests_do_not_touch_project_cache(self):
+        """Тесты пишут кеш во временный каталог, а не в BASE_DIR."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            os.path.dirname(location), os.path.abspath(settings.BASE_DIR))
+        self.assertEqual(cache.location, location)
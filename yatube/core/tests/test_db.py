@@ -0,0 +1,57 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import db
+
+
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Прагмы из SQLITE_PRAGMAS применяются к соединению."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+
+@override_settings(SQLITE_WRITE_RETRIES=2, SQLITE_RETRY_DELAY=0)
+class RetryLockedTest(SimpleTestCase):
+    def test_locked_write_is_retried(self):
+        """Запись, упершаяся в блокировку, повторяется."""
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'done'])
+        self.assertEqual(db.retry_locked(write), 'done')
+        self.assertEqual(write.call_count, 2)
+
+    def test_retries_are_bounded(self):
+        """После SQLITE_WRITE_RETRIES повторов ошибка уходит наверх."""
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            db.retry_locked(write)
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        """Прочие ошибки базы не повторяются."""
+        write = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            db.retry_locked(write)
+        self.assertEqual(write.call_count, 1)
+
+
+class SQLiteBenchmarkTest(SimpleTestCase):
+    def test_benchmark_reports_throughput(self):
+        """Бенчмарк печатает число записей и чтений."""
+        out = StringIO()
+        call_command(
+            'sqlite_benchmark', '--writers', '2', '--readers', '2',
+            '--duration', '0.2', stdout=out,
+        )
+        self.assertIn('Записей:', out.getvalue())
+        self.assertIn('Чтений:', out.getvalue())
@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import (STATS_PREFIX, acquire_lease, bump, cached_object,
+                     get_or_compute, get_stats, is_fresh, local,
+                     release_lease)
+
+
+class CachedObjectTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local.clear()
+        self.loads = []
+
+    def load(self):
+        self.loads.append(1)
+        return f'value {len(self.loads)}'
+
+    def test_second_lookup_is_local(self):
+        """Повторное чтение не доходит до общего кеша и загрузки."""
+        self.assertEqual(cached_object('thing:a', self.load), 'value 1')
+        with mock.patch.object(cache, 'get') as shared_get:
+            self.assertEqual(cached_object('thing:a', self.load), 'value 1')
+        shared_get.assert_not_called()
+        local.flush_stats()
+        self.assertEqual(get_stats('local:thing')['hits'], 1)
+        self.assertEqual(get_stats('shared:thing')['misses'], 1)
+
+    def test_expired_local_entry_falls_back_to_shared(self):
+        """Устаревшая запись в памяти берется из общего кеша."""
+        cached_object('thing:a', self.load)
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 60):
+            self.assertEqual(cached_object('thing:a', self.load), 'value 1')
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(get_stats('shared:thing')['hits'], 1)
+
+    def test_bump_evicts_both_tiers(self):
+        """Смена поколения вытесняет объект из обоих уровней."""
+        cached_object('thing:a', self.load)
+        bump('thing:a')
+        self.assertEqual(cached_object('thing:a', self.load), 'value 2')
+
+    @override_settings(LOCAL_STATS_FLUSH=3)
+    def test_stats_are_written_in_batches(self):
+        """Счетчики попадают в общий кеш пачками, а не на каждое чтение."""
+        local.record('thing', True)
+        local.count_event('thing', 'stale')
+        self.assertIsNone(cache.get(f'{STATS_PREFIX}thing:hits'))
+        local.record('thing', False)
+        self.assertEqual(cache.get(f'{STATS_PREFIX}thing:hits'), 1)
+        self.assertEqual(cache.get(f'{STATS_PREFIX}thing:stale'), 1)
+        self.assertEqual(cache.get(f'{STATS_PREFIX}thing:misses'), 1)
+
+    @override_settings(LOCAL_CACHE_SIZE=2)
+    def test_local_tier_is_bounded(self):
+        """В памяти остаются только последние LOCAL_CACHE_SIZE записей."""
+        for key in ('a', 'b', 'c'):
+            local.set(key, key)
+        local.get('b')
+        local.set('d', 'd')
+        self.assertEqual(
+            [local.get(key) for key in 'abcd'], [None, 'b', None, 'd'])
+
+
+class StampedeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local.clear()
+        self.computed = []
+
+    def compute(self, value):
+        def run():
+            self.computed.append(value)
+            return value
+        return run
+
+    def get(self, version):
+        return get_or_compute(
+            'fragment', version, self.compute(version), 60, 'test')
+
+    def test_stale_value_served_while_leased(self):
+        """Пока пересчет у другого процесса, отдается прежнее значение."""
+        self.get('v1')
+        local.clear()
+        acquire_lease('fragment')
+        self.assertEqual(self.get('v2'), 'v1')
+        self.assertEqual(get_stats('test')['stale'], 1)
+        release_lease('fragment')
+        self.assertEqual(self.get('v2'), 'v2')
+        self.assertEqual(self.computed, ['v1', 'v2'])
+
+    @override_settings(CACHE_LEASE_WAIT=0)
+    def test_missing_value_computed_after_wait(self):
+        """Без прежнего значения запрос не остается без ответа."""
+        acquire_lease('fragment')
+        self.assertEqual(self.get('v1'), 'v1')
+        self.assertFalse(cache.add('lease:fragment', True))
+
+    def test_early_refresh_near_expiry(self):
+        """Долгий пересчет у самого срока запускается досрочно."""
+        entry = {
+            'version': 'v1', 'value': 'v1',
+            'delta': 10, 'expires': time.time() + 1,
+        }
+        with mock.patch('random.random', return_value=0.5):
+            self.assertFalse(is_fresh(entry, 'v1'))
+        entry['expires'] = time.time() + 60
+        with mock.patch('random.random', return_value=0.5):
+            self.assertTrue(is_fresh(entry, 'v1'))
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import local
+from core.routers import ReplicaRouter, read_from_replica, state
+from posts.models import Post, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def read_db(self):
+        return read_from_replica(
+            lambda request: self.router.db_for_read(Post))(None)
+
+    def test_reads_from_replica_only_in_marked_views(self):
+        """С реплики читают только представления с read_from_replica."""
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertEqual(self.read_db(), 'replica')
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_pinned_user_reads_primary(self):
+        """Закрепленный за основной базой пользователь читает из нее."""
+        state.pinned = True
+        try:
+            self.assertIsNone(self.read_db())
+        finally:
+            state.pinned = False
+
+    def test_writes_go_to_primary(self):
+        """Запись всегда идет в основную базу."""
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик все читают из основной базы."""
+        self.assertIsNone(self.read_db())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_TIMEOUT=None)
+class ReadYourWritesTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='test_text')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_writer_sticks_to_primary(self):
+        """После записи пользователь какое-то время читает из основной базы."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.assertGreater(self.replica_queries(url), 0)
+        self.assertNotIn('pin_primary', self.client.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'comment'},
+        )
+        self.assertIn('pin_primary', response.cookies)
+        self.assertEqual(self.replica_queries(url), 0)
+
+
+class SnapshotReplicaTestCase(TransactionTestCase):
+    """Реплика — копия default во временном файле.
+
+    В отличие от зеркала она читается отдельным соединением и видит
+    только строки, закоммиченные к последнему sync_replicas.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        # Соединение зеркала с базой в памяти не закрывается, поэтому
+        # на время теста под алиасом стоит отдельное соединение.
+        self.mirror = connections['replica']
+        self.replica_dir = tempfile.mkdtemp()
+        connections['replica'] = self.mirror.__class__({
+            **self.mirror.settings_dict,
+            'NAME': os.path.join(self.replica_dir, 'replica.sqlite3'),
+        }, 'replica')
+        cache.clear()
+        local.clear()
+
+    def tearDown(self):
+        connections['replica'].close()
+        connections['replica'] = self.mirror
+        shutil.rmtree(self.replica_dir, ignore_errors=True)
+        super().tearDown()
+
+    def sync_replicas(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_TIMEOUT=None)
+class ConcurrentReaderTest(SnapshotReplicaTestCase):
+    def test_render_before_commit_expires(self):
+        """Лента, собранная другим соединением до коммита, потом сброшена."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='old_text')
+        self.sync_replicas()
+        url = reverse('posts:index')
+        self.client.get(url)
+        with transaction.atomic():
+            Post.objects.create(author=user, text='new_text')
+            self.assertNotContains(self.client.get(url), 'new_text')
+        self.sync_replicas()
+        self.assertContains(self.client.get(url), 'new_text')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_page_rendered_before_commit_expires(self):
+        """Страница, собранная до коммита записи, сброшена после него."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='old_text')
+        self.sync_replicas()
+        url = reverse('posts:post_detail', args=(post.id,))
+        self.client.get(url)
+        with transaction.atomic():
+            post.text = 'new_text'
+            post.save()
+            self.assertNotContains(self.client.get(url), 'new_text')
+        self.sync_replicas()
+        self.assertContains(self.client.get(url), 'new_text')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_TIMEOUT=None)
+class StaleReplicaTest(SnapshotReplicaTestCase):
+    def test_writer_sees_own_post(self):
+        """Автор видит свой пост, хотя реплика отстала, а лента в кеше."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='old_text')
+        self.sync_replicas()
+        writer = Client()
+        writer.force_login(user)
+        response = writer.post(
+            reverse('posts:post_create'), {'text': 'new_text'})
+        self.assertIn('pin_primary', response.cookies)
+        # Другой читатель собирает ленту по реплике уже после сброса.
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        self.assertNotContains(reader.get(response.url), 'new_text')
+        self.assertContains(writer.get(response.url), 'new_text')
@@ -0,0 +1,129 @@
+from django.shortcuts import get_object_or_404
+
+from core.cache import (add_surrogate_keys, bump, cached_object, purge,
+                        version_of)
+
+from .models import Follow, Group, User
+
+INDEX = 'feed:index'
+# Суррогатный ключ главной страницы: ее сбрасывает любой новый пост.
+INDEX_KEY = 'index'
+# Общая область всех карточек: группы и имена авторов видны в каждой ленте.
+CARDS = 'feed:cards'
+
+
+def group_scope(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'feed:profile:{author_id}'
+
+
+def author_cards_scope(author_id):
+    """Карточки одного автора: в них видны его имя и ник."""
+    return f'{CARDS}:{author_id}'
+
+
+def follow_scope(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def feed_version(*scopes):
+    """Версия ленты; смена CARDS сбрасывает все ленты."""
+    return version_of(CARDS, *scopes)
+
+
+def follow_version(user_id):
+    """Лента подписок меняется вместе с профилями всех авторов в ней."""
+    author_ids = Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)
+    return feed_version(
+        follow_scope(user_id), *map(profile_scope, author_ids))
+
+
+def bump_post(post, *group_ids):
+    """Сбросить ленты, в которых показывается пост."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    bump(
+        INDEX,
+        profile_scope(post.author_id),
+        *map(group_scope, group_ids),
+    )
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def group_key(slug):
+    return f'group:{slug}'
+
+
+def author_key(username):
+    return f'author:{username}'
+
+
+def tag_page(request, response, posts, *keys):
+    """Пометить страницу анонимного читателя ключами ее постов.
+
+    Пост тянет за собой ключи своей группы и автора: их название и имя
+    видны в карточке.
+    """
+    if request.user.is_authenticated:
+        return response
+    keys = set(keys)
+    for post in posts:
+        keys.add(post_key(post.id))
+        keys.add(author_key(post.author.username))
+        if post.group:
+            keys.add(group_key(post.group.slug))
+    return add_surrogate_keys(response, *keys)
+
+
+def post_page_keys(post, *group_ids):
+    """Ключи страниц поста, его автора и групп."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    return [
+        INDEX_KEY,
+        post_key(post.id),
+        author_key(post.author.username),
+        *map(group_key, Group.objects.filter(
+            id__in=group_ids).values_list('slug', flat=True)),
+    ]
+
+
+def purge_post(post, *group_ids):
+    """Сбросить страницы поста, его автора и групп."""
+    purge(*post_page_keys(post, *group_ids))
+
+
+def group_object_scope(slug):
+    return f'group:{slug}'
+
+
+def user_object_scope(username):
+    return f'user:{username}'
+
+
+def get_group(slug):
+    """Группа по slug из кеша; Http404, если ее нет."""
+    return cached_object(
+        group_object_scope(slug),
+        lambda: get_object_or_404(Group, slug=slug),
+    )
+
+
+def get_author(username):
+    """Автор по имени из кеша; Http404, если его нет.
+
+    Объект общий для запросов процесса: связанные объекты через него не
+    загружаются, счетчики берутся отдельным запросом.
+    """
+    return cached_object(
+        user_object_scope(username),
+        lambda: get_object_or_404(
+            User.objects.only('id', 'username', 'first_name', 'last_name'),
+            username=username,
+        ),
+    )
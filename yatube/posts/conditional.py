@@ -0,0 +1,79 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .cache import feed_version, follow_scope, group_scope, profile_scope
+from .models import Group, Post, User
+
+
+def conditional(validate):
+    """condition() по одной функции, возвращающей (части etag, дата).
+
+    validate вызывается один раз на запрос: etag и Last-Modified
+    считаются по одному индексному запросу. None — объекта нет, ответ
+    отдается как обычно.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, 'validator'):
+            request.validator = validate(request, *args, **kwargs)
+        return request.validator
+
+    def etag(request, *args, **kwargs):
+        found = state(request, *args, **kwargs)
+        if found is None:
+            return None
+        # Вошедший пользователь видит свою версию страницы.
+        parts = (request.user.pk, *found[0])
+        return hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        found = state(request, *args, **kwargs)
+        return found and found[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def first_row(queryset):
+    # Без first(): его ORDER BY по pk заставляет SQLite сортировать группы.
+    return next(iter(queryset), None)
+
+
+def user_versions(request, *scopes):
+    if request.user.is_authenticated:
+        scopes += (follow_scope(request.user.pk),)
+    return feed_version(*scopes)
+
+
+def group_validator(request, slug):
+    rows = Group.objects.filter(slug=slug).order_by().values('id').annotate(
+        last=Max('posts__pub_date'), total=Count('posts'),
+    )
+    found = first_row(rows.values_list('id', 'last', 'total'))
+    if found is None:
+        return None
+    # Правка поста не сдвигает pub_date, ее ловит только версия ленты,
+    # поэтому Last-Modified здесь не отдается.
+    return (*found, user_versions(request, group_scope(found[0]))), None
+
+
+def profile_validator(request, username):
+    fields = ('id', 'stats__followers_count', 'stats__following_count')
+    rows = User.objects.filter(username=username).order_by().values(
+        *fields).annotate(last=Max('posts__pub_date'), total=Count('posts'))
+    found = first_row(rows.values_list(*fields, 'last', 'total'))
+    if found is None:
+        return None
+    return (*found, user_versions(request, profile_scope(found[0]))), None
+
+
+def post_validator(request, post_id):
+    fields = (
+        'author_id', 'updated', 'comments_count', 'author__stats__posts_count',
+    )
+    found = first_row(Post.objects.filter(id=post_id).values_list(*fields))
+    if found is None:
+        return None
+    # Удаление комментария и переименование автора не сдвигают ни одну
+    # дату поста, их ловит только ETag, поэтому Last-Modified не отдается.
+    return (*found, user_versions(request, profile_scope(found[0]))), None
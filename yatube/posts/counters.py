@@ -0,0 +1,99 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author_id'),
+    'followers_count': (Follow, 'author_id'),
+    'following_count': (Follow, 'user_id'),
+}
+
+
+def bump_user(user_id, **deltas):
+    """Сдвинуть счетчики пользователя; строка создается при первом +1."""
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    # Счетчик не уходит в минус, даже если успел разойтись с данными.
+    floors = {
+        f'{name}__gte': -delta
+        for name, delta in deltas.items() if delta < 0
+    }
+    if UserStats.objects.filter(user_id=user_id, **floors).update(**changes):
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(
+        id=post_id, comments_count__gte=-min(delta, 0)
+    ).update(comments_count=F('comments_count') + delta)
+
+
+def get_stats(user):
+    """Счетчики пользователя или нули, если строки еще нет."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def load_stats(user):
+    """Счетчики свежим запросом, не заполняя кеш связей у user."""
+    return (
+        UserStats.objects.filter(user_id=user.id).first()
+        or UserStats(user_id=user.id)
+    )
+
+
+def count_by(model, field, ids):
+    return dict(
+        model.objects.filter(**{f'{field}__in': ids})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values_list(field, 'total')
+    )
+
+
+def reconcile_users(user_ids, fix=True):
+    """Пересчитать счетчики пачки пользователей, вернуть расхождения."""
+    actual = {
+        name: count_by(model, field, user_ids)
+        for name, (model, field) in USER_COUNTERS.items()
+    }
+    stored = UserStats.objects.in_bulk(user_ids)
+    drift = []
+    for user_id in user_ids:
+        stats = stored.get(user_id) or UserStats(user_id=user_id)
+        changed = {
+            name: actual[name].get(user_id, 0)
+            for name in USER_COUNTERS
+            if getattr(stats, name) != actual[name].get(user_id, 0)
+        }
+        if not changed:
+            continue
+        drift.append((user_id, {
+            name: (getattr(stats, name), value)
+            for name, value in changed.items()
+        }))
+        if fix:
+            UserStats.objects.update_or_create(
+                user_id=user_id, defaults=changed)
+    return drift
+
+
+def reconcile_posts(post_ids, fix=True):
+    """Пересчитать comments_count пачки постов, вернуть расхождения."""
+    actual = count_by(Comment, 'post_id', post_ids)
+    drift = []
+    posts = Post.objects.filter(id__in=post_ids).values_list(
+        'id', 'comments_count')
+    for post_id, stored in posts:
+        value = actual.get(post_id, 0)
+        if stored == value:
+            continue
+        drift.append((post_id, {'comments_count': (stored, value)}))
+        if fix:
+            Post.objects.filter(id=post_id).update(comments_count=value)
+    return drift
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# Тег EXIF с ориентацией и его значения, при которых стороны меняются.
+ORIENTATION = 0x0112
+TRANSPOSED = {5, 6, 7, 8}
+
+
+def formats():
+    """Форматы вариантов: WebP, если Pillow собран с ним, и JPEG всегда."""
+    return ['webp', 'jpeg'] if features.check('webp') else ['jpeg']
+
+
+def widths(spec, source_width):
+    """Ширины варианта, не превышающие исходную картинку.
+
+    Самая узкая остается всегда: маленький исходник растягивается до нее.
+    """
+    widths = sorted(spec['widths'])
+    return [widths[0]] + [w for w in widths[1:] if w <= source_width]
+
+
+def variant_dir(post_id):
+    return f'variants/{post_id}'
+
+
+def variant_path(post, name, width, image_format):
+    image = hashlib.md5(post.image.name.encode()).hexdigest()[:12]
+    return (
+        f'{variant_dir(post.id)}/{image}/{name}-{width}.{image_format}')
+
+
+def delete_variants(post_id, keep=()):
+    """Удалить файлы вариантов поста, кроме путей из keep."""
+    root = variant_dir(post_id)
+    try:
+        directories, _ = default_storage.listdir(root)
+    except FileNotFoundError:
+        return
+    for directory in directories:
+        _, names = default_storage.listdir(f'{root}/{directory}')
+        for name in names:
+            path = f'{root}/{directory}/{name}'
+            if path not in keep:
+                default_storage.delete(path)
+
+
+def render(post, name, spec):
+    """Сохранить все ширины и форматы варианта name картинки поста.
+
+    Возвращает {формат: [(ширина, высота, url), ...]} по возрастанию
+    ширины и список записанных файлов.
+    """
+    with post.image.open('rb') as file:
+        source = Image.open(file)
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        source.draft('RGB', (max(spec['widths']),) * 2)
+        source.load()
+    source = source.convert('RGB')
+    ratio_width, ratio_height = spec['size'] or source.size
+    result, paths = {}, []
+    for image_format in formats():
+        files = []
+        for width in widths(spec, source.width):
+            height = round(width * ratio_height / ratio_width)
+            image = ImageOps.fit(
+                source, (width, height), Image.LANCZOS, centering=(0.5, 0.5))
+            buffer = BytesIO()
+            image.save(
+                buffer, image_format,
+                quality=spec.get('quality', settings.IMAGE_QUALITY))
+            path = variant_path(post, name, width, image_format)
+            default_storage.delete(path)
+            path = default_storage.save(path, ContentFile(buffer.getvalue()))
+            paths.append(path)
+            files.append((width, height, default_storage.url(path)))
+        result[image_format] = files
+    return result, paths
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def normalize(upload):
+    """Привести загрузку к небольшому оригиналу без метаданных.
+
+    Размер проверяется по заголовку, до декодирования. Картинка больше
+    IMAGE_MAX_SIDE уменьшается через draft/reduce, ориентация из EXIF
+    применяется к пикселям, а EXIF не сохраняется. Прозрачные картинки
+    сохраняются в PNG, остальные — в JPEG.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                f'Слишком большое изображение: {width}x{height}.',
+                code='image_too_large',
+            )
+        max_side = settings.IMAGE_MAX_SIDE
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=3)
+        icc_profile = image.info.get('icc_profile')
+        if has_alpha(image):
+            image_format, extension = 'PNG', 'png'
+            image = image.convert('RGBA')
+        else:
+            image_format, extension = 'JPEG', 'jpg'
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(
+            buffer, image_format, quality=settings.IMAGE_QUALITY,
+            optimize=True, icc_profile=icc_profile,
+        )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(buffer.getvalue(), name=f'{stem}.{extension}')
+
+
+def describe(file):
+    """Размеры картинки и крошечное превью для показа до загрузки.
+
+    Превью — JPEG со стороной IMAGE_PLACEHOLDER_SIZE в data URI; браузер
+    растягивает его на место картинки, пока та грузится.
+    """
+    file.open('rb')
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            if image.getexif().get(ORIENTATION) in TRANSPOSED:
+                width, height = height, width
+            side = settings.IMAGE_PLACEHOLDER_SIZE
+            image.draft('RGB', (side, side))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+            image.thumbnail((side, side), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=40)
+    finally:
+        file.seek(0)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{data}'
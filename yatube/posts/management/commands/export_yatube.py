@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import dumps, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Выгружает пользователей, группы, посты, комментарии и подписки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines для выгрузки.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        counts = {}
+        started = time.monotonic()
+        with open(options['path'], 'w', encoding='utf-8') as file:
+            for model, row in export_rows(options['chunk_size']):
+                file.write(dumps(model, row) + '\n')
+                counts[model] = counts.get(model, 0) + 1
+        elapsed = time.monotonic() - started
+        total = sum(counts.values())
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено: {total}, {total / max(elapsed, 1e-6):.0f} строк/с.'
+        ))
@@ -0,0 +1,211 @@
+import json
+import os
+import time
+from collections import Counter
+from itertools import groupby, islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from core.cache import bump, purge
+from core.storage import retain
+from posts import cache
+from posts.models import Comment, Follow, Group, Post, User
+from posts.transfer import keep_dates, loads
+
+
+def read_batches(file, start, batch_size):
+    """Пачки (номер последней строки, модель, строки) после строки start.
+
+    В пачке строки одной модели, не больше batch_size.
+    """
+    lines = islice(enumerate(file, 1), start, None)
+    rows = ((number, *loads(line)) for number, line in lines if line.strip())
+    for model, group in groupby(rows, key=lambda row: row[1]):
+        while True:
+            batch = list(islice(group, batch_size))
+            if not batch:
+                break
+            yield batch[-1][0], model, [row for _, _, row in batch]
+
+
+def user_ids(usernames):
+    return dict(User.objects.filter(
+        username__in=set(usernames)).values_list('username', 'id'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_yatube пачками через bulk_create. '
+        'Сайт на время загрузки закрыт для записи: id постов и '
+        'комментариев сдвигаются за занятые при первом запуске.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines из export_yatube.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл отметки для продолжения; по умолчанию рядом с path.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or f'{options["path"]}.checkpoint'
+        # Первая пачка продолженной загрузки могла быть записана до сбоя,
+        # но не отмечена.
+        self.replay = os.path.exists(checkpoint)
+        state = self.read_state(checkpoint)
+        # Сдвиг id отмечается до первой пачки: иначе повтор после сбоя
+        # посчитал бы его заново, уже за записанными строками.
+        self.write_state(checkpoint, state)
+        if state['line']:
+            self.stdout.write(f'Продолжение после строки {state["line"]}.')
+        imported = 0
+        started = time.monotonic()
+        with open(options['path'], encoding='utf-8') as file, \
+                keep_dates(Post, Comment):
+            for line, model, rows in read_batches(
+                    file, state['line'], options['batch_size']):
+                with transaction.atomic():
+                    getattr(self, f'import_{model}')(rows, state['offsets'])
+                self.replay = False
+                state['line'] = line
+                self.write_state(checkpoint, state)
+                imported += len(rows)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{model}: строка {line}, '
+                    f'{imported / max(elapsed, 1e-6):.0f} строк/с.'
+                )
+        # bulk_create не шлет сигналов: счетчики, ленты подписок и кеши
+        # приводятся в порядок после загрузки.
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        bump(cache.CARDS)
+        os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {imported}.'))
+
+    def read_state(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        # id постов и комментариев сдвигаются за уже занятые, и сдвиг
+        # хранится в отметке: повтор пачки попадет в те же id.
+        return {
+            'line': 0,
+            'offsets': {
+                model._meta.model_name: (
+                    model.objects.aggregate(top=Max('id'))['top'] or 0)
+                for model in (Post, Comment)
+            },
+        }
+
+    def write_state(self, path, state):
+        partial = f'{path}.part'
+        with open(partial, 'w') as file:
+            json.dump(state, file)
+        os.replace(partial, path)
+
+    def skip_replayed(self, model, objects, fields):
+        """Объекты, id которых еще свободны.
+
+        Занятый id допустим только в повторе неотмеченной пачки и только
+        для той же записи. Любой другой значит, что на сайте писали во
+        время загрузки, и сдвиг id из отметки больше не верен.
+        """
+        existing = {
+            row['id']: row for row in model.objects.filter(
+                id__in=[obj.id for obj in objects]).values('id', *fields)
+        }
+        for obj in objects:
+            row = existing.get(obj.id)
+            if row is not None and (not self.replay or any(
+                    getattr(obj, field) != row[field] for field in fields)):
+                raise CommandError(
+                    f'{model._meta.model_name} с id {obj.id} уже есть в '
+                    f'базе; загрузка идет только при закрытом сайте.'
+                )
+        return [obj for obj in objects if obj.id not in existing]
+
+    def import_user(self, rows, offsets):
+        User.objects.bulk_create(
+            [User(**row) for row in rows], ignore_conflicts=True)
+
+    def import_group(self, rows, offsets):
+        Group.objects.bulk_create(
+            [Group(**row) for row in rows], ignore_conflicts=True)
+        purge(*(cache.group_key(row['slug']) for row in rows))
+
+    def import_post(self, rows, offsets):
+        usernames = [row.pop('author_username') for row in rows]
+        slugs = [row.pop('group_slug') for row in rows]
+        authors = user_ids(usernames)
+        groups = dict(Group.objects.filter(
+            slug__in=set(slugs)).values_list('slug', 'id'))
+        posts = [
+            Post(
+                id=row.pop('id') + offsets['post'],
+                author_id=authors[username],
+                group_id=groups.get(slug),
+                **row,
+            )
+            for row, username, slug in zip(rows, usernames, slugs)
+        ]
+        # Уже вставленные посты повтора пропускаются, чтобы не считать
+        # их картинки дважды.
+        posts = self.skip_replayed(
+            Post, posts, ('text', 'author_id', 'group_id', 'pub_date'))
+        Post.objects.bulk_create(posts)
+        for name, count in Counter(post.image.name for post in posts).items():
+            retain(name, count)
+        bump(
+            cache.INDEX,
+            *{cache.profile_scope(post.author_id) for post in posts},
+            *{cache.group_scope(group_id) for group_id in groups.values()},
+        )
+        purge(
+            cache.INDEX_KEY,
+            *map(cache.author_key, authors),
+            *map(cache.group_key, groups),
+        )
+
+    def import_comment(self, rows, offsets):
+        usernames = [row.pop('author_username') for row in rows]
+        authors = user_ids(usernames)
+        comments = []
+        for row, username in zip(rows, usernames):
+            post_id = row.pop('post_id')
+            comments.append(Comment(
+                id=row.pop('id') + offsets['comment'],
+                post_id=post_id and post_id + offsets['post'],
+                author_id=authors[username],
+                **row,
+            ))
+        comments = self.skip_replayed(
+            Comment, comments, ('text', 'author_id', 'post_id', 'created'))
+        Comment.objects.bulk_create(comments)
+        purge(*{
+            cache.post_key(comment.post_id)
+            for comment in comments if comment.post_id
+        })
+
+    def import_follow(self, rows, offsets):
+        ids = user_ids(
+            name for row in rows
+            for name in (row['user_username'], row['author_username']))
+        Follow.objects.bulk_create([
+            Follow(
+                user_id=ids[row['user_username']],
+                author_id=ids[row['author_username']],
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+        bump(*{cache.follow_scope(ids[row['user_username']]) for row in rows})
+        purge(*map(cache.author_key, ids))
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+CHECKPOINT = os.path.join(settings.BASE_DIR, 'rebuild_thumbnails.checkpoint')
+
+
+def read_checkpoint(path):
+    """id последнего пересобранного поста или 0."""
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, post_id):
+    partial = f'{path}.part'
+    with open(partial, 'w') as file:
+        file.write(str(post_id))
+    os.replace(partial, path)
+
+
+def post_ids(after, batch_size):
+    """Пачки id постов с картинками по возрастанию, начиная после after."""
+    posts = Post.objects.exclude(image='').order_by('id')
+    while True:
+        batch = list(posts.filter(id__gt=after).values_list(
+            'id', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after = batch[-1]
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает варианты картинок всех постов в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько процессов собирают картинки; 0 — в этом процессе.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько постов отдавать пулу между отметками прогресса.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Не больше стольких постов в секунду; 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--checkpoint', default=CHECKPOINT,
+            help='Файл с id последнего пересобранного поста.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первого поста, не глядя на отметку.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        after = 0 if options['restart'] else read_checkpoint(checkpoint)
+        total = Post.objects.exclude(image='').filter(id__gt=after).count()
+        if after:
+            self.stdout.write(f'Продолжение после поста {after}.')
+        if options['workers']:
+            # Процессы запускаются заново, а не копией этого: соединения
+            # с базой и кешем нельзя делить между процессами.
+            pool = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+            build = pool.map
+        else:
+            pool = None
+            build = map
+        done = failed = 0
+        started = time.monotonic()
+        try:
+            for batch in post_ids(after, options['batch_size']):
+                if options['rate']:
+                    delay = started + done / options['rate'] - time.monotonic()
+                    time.sleep(max(delay, 0))
+                results = list(build(thumbnails.build_logged, batch))
+                done += len(batch)
+                failed += results.count(False)
+                write_checkpoint(checkpoint, batch[-1])
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{done}/{total}: {done / elapsed:.1f} постов/с, '
+                    f'ошибок {failed}, отметка {batch[-1]}.'
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        # Следующий запуск, например после смены размеров, начнется с начала.
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано: {done - failed}, ошибок: {failed}.'
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает ленты подписок пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Перестроить ленты только этих пользователей.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TIMELINE_BATCH_SIZE,
+            help='Сколько строк ленты вставлять за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        if options['usernames']:
+            user_ids = User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('id', flat=True)
+        else:
+            user_ids = Follow.objects.order_by('user_id').values_list(
+                'user_id', flat=True).distinct()
+        users = entries = 0
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                entries += timeline.rebuild(user_id, options['batch_size'])
+            users += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент перестроено: {users}, строк: {entries}.'
+        ))
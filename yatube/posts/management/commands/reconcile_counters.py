@@ -0,0 +1,57 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts.models import Post, User
+
+
+def chunked(queryset, size):
+    ids = queryset.order_by('id').values_list('id', flat=True).iterator()
+    while True:
+        chunk = list(islice(ids, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправлять.',
+        )
+
+    def report(self, label, drift):
+        for pk, fields in drift:
+            changes = ', '.join(
+                f'{name}: {stored} -> {actual}'
+                for name, (stored, actual) in fields.items()
+            )
+            self.stdout.write(f'{label} {pk}: {changes}')
+
+    def handle(self, *args, **options):
+        fix = not options['dry_run']
+        size = options['chunk_size']
+        total = 0
+        for chunk in chunked(User.objects.all(), size):
+            with transaction.atomic():
+                drift = counters.reconcile_users(chunk, fix)
+            self.report('user', drift)
+            total += len(drift)
+        for chunk in chunked(Post.objects.all(), size):
+            with transaction.atomic():
+                drift = counters.reconcile_posts(chunk, fix)
+            self.report('post', drift)
+            total += len(drift)
+        message = f'Расхождений: {total}.'
+        if total and fix:
+            message += ' Исправлено.'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import is_hashed, retain
+from posts.models import Post
+
+storage = Post._meta.get_field('image').storage
+
+
+def legacy_posts(batch_size):
+    """Пачки постов, чьи картинки еще лежат в плоском каталоге."""
+    posts = (
+        post for post in Post.objects.exclude(image='').only('id', 'image')
+        .order_by('id').iterator()
+        if not is_hashed(post.image.name)
+    )
+    while True:
+        batch = list(islice(posts, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy(post):
+    """Записать файл поста в хранилище по содержимому; None — нет файла."""
+    try:
+        with default_storage.open(post.image.name) as file:
+            return storage.save(post.image.name, file)
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище по содержимому.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько постов переносить за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько файлов копировать параллельно.',
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        with ThreadPoolExecutor(options['workers']) as pool:
+            for batch in legacy_posts(options['batch_size']):
+                names = list(pool.map(copy, batch))
+                done = [
+                    (post, name) for post, name in zip(batch, names) if name]
+                missing += len(batch) - len(done)
+                with transaction.atomic():
+                    for post, name in done:
+                        Post.objects.filter(
+                            id=post.id, image=post.image.name
+                        ).update(image=name)
+                        retain(name)
+                old_names = {post.image.name for post, _ in done}
+                still_used = set(Post.objects.filter(
+                    image__in=old_names).values_list('image', flat=True))
+                list(pool.map(default_storage.delete, old_names - still_used))
+                moved += len(done)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, без файла: {missing}.'
+        ))
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    comments = Comment.objects.filter(post__isnull=False).order_by().values(
+        'post_id').annotate(total=Count('id')).values_list('post_id', 'total')
+    for post_id, total in comments.iterator():
+        Post.objects.filter(id=post_id).update(comments_count=total)
+    counters = (
+        ('posts_count', Post, 'author_id'),
+        ('followers_count', Follow, 'author_id'),
+        ('following_count', Follow, 'user_id'),
+    )
+    for name, model, field in counters:
+        totals = model.objects.order_by().values(field).annotate(
+            total=Count('id')).values_list(field, 'total')
+        for user_id, total in totals.iterator():
+            UserStats.objects.update_or_create(
+                user_id=user_id, defaults={name: total})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
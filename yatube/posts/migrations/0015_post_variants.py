@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_content_addressed_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='variants',
+            field=models.TextField(blank=True, default='', editable=False, help_text='JSON с готовыми файлами миниатюр по IMAGE_VARIANTS', verbose_name='Варианты картинки'),
+        ),
+    ]
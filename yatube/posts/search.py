@@ -0,0 +1,158 @@
+import re
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import Max
+
+from .models import Post
+from .paginator import (NEXT, PREVIOUS, CursorPage, InvalidCursor,
+                        make_page)
+
+TABLE = 'posts_post_fts'
+CURSOR_SALT = 'posts.search.cursor'
+TRIGGERS = {
+    'posts_post_fts_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        f'INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+    'posts_post_fts_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        f"INSERT INTO {TABLE}({TABLE}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END"
+    ),
+    'posts_post_fts_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        f"INSERT INTO {TABLE}({TABLE}, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        f'INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END'
+    ),
+}
+# Оценка bm25 (чем меньше, тем лучше) делится на 1 + возраст поста в
+# SEARCH_RECENCY_DAYS: из равных по тексту выше окажется более свежий.
+RANKED = f'''
+    SELECT posts_post.id AS id,
+           bm25({TABLE}) / (1 + MAX(%s - julianday(posts_post.pub_date), 0)
+                            / %s) AS score
+    FROM {TABLE} JOIN posts_post ON posts_post.id = {TABLE}.rowid
+    WHERE {TABLE} MATCH %s AND posts_post.id <= %s
+'''
+AFTER = {
+    NEXT: ('score > %s OR (score = %s AND id < %s)', 'score, id DESC'),
+    PREVIOUS: ('score < %s OR (score = %s AND id > %s)', 'score DESC, id'),
+}
+
+
+def install(connection):
+    """Создать полнотекстовый индекс постов и триггеры, если их нет.
+
+    SQLite пересоздает таблицу постов при изменении ее схемы, и триггеры
+    пропадают вместе со старой таблицей: тогда индекс строится заново.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'")
+        present = {name for name, in cursor.fetchall()}
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')")
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        if not present >= set(TRIGGERS):
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def match_query(text):
+    """Запрос FTS5 из слов text: все слова, каждое как префикс.
+
+    Кавычки и операторы из ввода не попадают в запрос.
+    """
+    words = re.findall(r'\w+', text.lower())[:settings.SEARCH_MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def julian_now():
+    return time.time() / 86400 + 2440587.5
+
+
+class SearchPaginator:
+    """Выдача поиска по (оценка, id) с курсором.
+
+    В курсор записаны момент первого запроса и наибольший id поста на тот
+    момент: поправка на свежесть считается от этого момента, а новые
+    посты не вклиниваются в уже листаемую выдачу. Порядок все равно не
+    строго стабилен: bm25 зависит от статистики всего индекса, и правки
+    и новые посты сдвигают оценки, так что на границе страниц пост может
+    повториться или пропасть.
+    """
+
+    def __init__(self, text, per_page):
+        self.match = match_query(text)
+        self.per_page = int(per_page)
+
+    def encode_cursor(self, post, direction, now, max_id):
+        return signing.dumps(
+            [direction, now, max_id, post.search_score, post.id],
+            salt=CURSOR_SALT)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, now, max_id, score, pk = signing.loads(
+                cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor(cursor)
+        return direction, now, max_id, (score, pk)
+
+    def fetch(self, now, max_id, values, direction, limit):
+        sql = RANKED
+        params = [now, settings.SEARCH_RECENCY_DAYS, self.match, max_id]
+        condition, ordering = AFTER[direction]
+        if values is not None:
+            score, pk = values
+            sql = f'SELECT * FROM ({sql}) WHERE {condition}'
+            params += [score, score, pk]
+        sql += f' ORDER BY {ordering} LIMIT %s'
+        params.append(limit)
+        queryset = Post.objects.select_related('author', 'group')
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            scores = dict(cursor.fetchall())
+        posts = queryset.in_bulk(list(scores))
+        ranked = []
+        for pk, score in scores.items():
+            if pk in posts:
+                posts[pk].search_score = score
+                ranked.append(posts[pk])
+        return ranked
+
+    def get_page(self, cursor):
+        """Вернуть страницу; неверный курсор открывает первую страницу."""
+        try:
+            direction, now, max_id, values = self.decode_cursor(cursor)
+        except InvalidCursor:
+            cursor, direction, values = None, NEXT, None
+            now, max_id = julian_now(), None
+        if not self.match:
+            return CursorPage([], self, None)
+        if max_id is None:
+            max_id = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        items = self.fetch(now, max_id, values, direction, self.per_page + 1)
+        return make_page(
+            self, cursor, direction, values, items,
+            partial(self.encode_cursor, now=now, max_id=max_id),
+        )
@@ -0,0 +1,263 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from PIL import Image
+
+from core.storage import release, retain
+
+from . import cache, counters, images, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые видны в карточках его постов.
+CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.promote(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.demote(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    previous = instance.pk and Post.objects.filter(
+        pk=instance.pk).values_list('group_id', 'image').first()
+    instance.previous_group_id, instance.previous_image = (
+        previous or (None, ''))
+    if not raw and instance.image.name != instance.previous_image:
+        instance.variants = ''
+        describe_image(instance)
+
+
+def describe_image(instance):
+    instance.image_width = instance.image_height = None
+    instance.image_placeholder = ''
+    if not instance.image:
+        return
+    try:
+        (instance.image_width, instance.image_height,
+         instance.image_placeholder) = images.describe(instance.image)
+    except (OSError, SuspiciousFileOperation, Image.DecompressionBombError,
+            ValueError):
+        # Без размеров и превью страница покажет обычную заглушку.
+        pass
+
+
+@receiver(post_save, sender=Post)
+def count_image(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, 'previous_image', '')
+    if not raw and instance.image.name != previous:
+        retain(instance.image.name)
+        release(previous, instance.image.storage)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_image(sender, instance, **kwargs):
+    release(instance.image.name, instance.image.storage)
+
+
+@receiver(post_save, sender=Post)
+def drop_replaced_variants(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, 'previous_image', '')
+    if not created and not raw and instance.image.name != previous:
+        post_id = instance.id
+        transaction.on_commit(lambda: images.delete_variants(post_id))
+
+
+@receiver(post_delete, sender=Post)
+def drop_variants(sender, instance, **kwargs):
+    post_id = instance.id
+    transaction.on_commit(lambda: images.delete_variants(post_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    group_id = getattr(instance, 'previous_group_id', None)
+    transaction.on_commit(lambda: cache.bump_post(instance, group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    if post:
+        transaction.on_commit(lambda: cache.bump_post(post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.bump(cache.CARDS))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields=None,
+                            **kwargs):
+    # Ленты главной и групп со старым именем доживают FEED_CACHE_TIMEOUT:
+    # сбрасывать их все ради одного автора дороже.
+    if created or card_fields(instance) == getattr(
+            instance, 'previous_card', None):
+        return
+    scopes = [
+        cache.author_cards_scope(instance.id),
+        cache.profile_scope(instance.id),
+    ]
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    scope = cache.follow_scope(instance.user_id)
+    transaction.on_commit(lambda: cache.bump(scope))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    # Ключи собираются сразу: после коммита автора или группы может уже
+    # не быть.
+    keys = cache.post_page_keys(
+        instance, getattr(instance, 'previous_group_id', None))
+    transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    if instance.post_id:
+        key = cache.post_key(instance.post_id)
+        transaction.on_commit(lambda: cache.purge(key))
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    instance.previous_slug = instance.pk and Group.objects.filter(
+        pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, 'previous_slug', None)}
+    keys = [cache.group_key(slug) for slug in slugs - {None}]
+    transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def evict_group(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, 'previous_slug', None)}
+    scopes = [cache.group_object_scope(slug) for slug in slugs - {None}]
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if update_fields == frozenset({'last_login'}):
+        instance.previous_card = card_fields(instance)
+        return
+    instance.previous_card = instance.pk and User.objects.filter(
+        pk=instance.pk).values_list(*CARD_FIELDS).first()
+    instance.previous_username = (
+        instance.previous_card[0] if instance.previous_card else None)
+
+
+def card_fields(instance):
+    return tuple(getattr(instance, name) for name in CARD_FIELDS)
+
+
+def usernames(instance):
+    return {
+        instance.username, getattr(instance, 'previous_username', None)
+    } - {None}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields != frozenset({'last_login'}):
+        scopes = [
+            cache.user_object_scope(name) for name in usernames(instance)]
+        transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+@receiver(post_save, sender=User)
+def purge_author_pages(sender, instance, update_fields=None, **kwargs):
+    # Имя может достаться новому пользователю после удаления старого.
+    if update_fields != frozenset({'last_login'}):
+        keys = [cache.author_key(name) for name in usernames(instance)]
+        transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    keys = [
+        cache.author_key(instance.author.username),
+        cache.author_key(instance.user.username),
+    ]
+    transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_migrate)
+def install_search(sender, using, **kwargs):
+    # Миграции, пересоздающие таблицу постов, теряют триггеры индекса.
+    if sender.name == 'posts':
+        search.install(connections[using])
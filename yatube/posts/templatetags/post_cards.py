@@ -0,0 +1,41 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import get_generations, local
+
+from ..cache import CARDS, author_cards_scope
+
+register = template.Library()
+
+
+def card_key(post, generations):
+    return (
+        f'post_card:{post.id}:{post.updated.timestamp()}:'
+        f'{post.comments_count}:{generations[CARDS]}:'
+        f'{generations[author_cards_scope(post.author_id)]}'
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек постов; готовые берутся из кеша одним get_many.
+
+    {% post_cards page_obj as cards %}
+    """
+    generations = get_generations(CARDS, *{
+        author_cards_scope(post.author_id) for post in posts})
+    keys = {card_key(post, generations): post for post in posts}
+    cards = cache.get_many(keys)
+    local.record('post_card', True, len(cards))
+    rendered = {
+        key: render_to_string('posts/includes/post_card.html', {'post': post})
+        for key, post in keys.items() if key not in cards
+    }
+    if rendered:
+        local.record('post_card', False, len(rendered))
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,53 @@
+from django import template
+from django.conf import settings
+
+from ..images import MIME_TYPES
+from ..thumbnails import get_variant, schedule
+
+register = template.Library()
+
+
+def srcset(files):
+    return ', '.join(f'{url} {width}w' for width, _, url in files)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, name):
+    """<picture> по готовым вариантам картинки или заглушка.
+
+    Сама картинка в запросе не декодируется: размеры и превью уже
+    лежат в посте. Если вариантов еще нет, сборка ставится в очередь.
+
+    {% post_picture post 'card' %}
+    """
+    spec = settings.IMAGE_VARIANTS[name]
+    size = spec['size'] or (post.image_width, post.image_height)
+    context = {
+        'has_image': bool(post.image),
+        'size': size if all(size) else None,
+        'placeholder': post.image_placeholder,
+    }
+    if not post.image:
+        return context
+    variant = get_variant(post, name)
+    if variant is None:
+        schedule(post)
+    if not variant:
+        return context
+    fallback = variant['jpeg']
+    width, height, url = fallback[-1]
+    context.update({
+        'sources': [
+            {'type': MIME_TYPES[image_format], 'srcset': srcset(files)}
+            for image_format, files in variant.items()
+            if image_format != 'jpeg'
+        ],
+        'image': {
+            'src': url,
+            'srcset': srcset(fallback),
+            'width': width,
+            'height': height,
+        },
+        'sizes': spec['sizes'],
+    })
+    return context
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.post = Post.objects.create(author=cls.author, text='test_text')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_writes_update_counters(self):
+        """Посты, комментарии и подписки меняют счетчики."""
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'test_comment'},
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'TestAuthor'}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'TestAuthor'}))
+        Comment.objects.all().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_reads_counter(self):
+        """Профиль показывает число постов из счетчика."""
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}))
+        self.assertEqual(response.context['post_quantity'], 42)
+
+    def test_reconcile_counters_command(self):
+        """reconcile_counters находит и исправляет расхождения."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=7)
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn(
+            f'post {self.post.id}: comments_count: 7 -> 0', out.getvalue())
+        self.assertFalse(UserStats.objects.exists())
+        call_command('reconcile_counters', '--chunk-size', '1', stdout=out)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
@@ -1,7 +1,13 @@
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+
+from core import db
 
 from ..forms import PostForm
 from ..models import Group, Post, User
@@ -53,6 +59,16 @@ class PostFormTests(TestCase):
         self.assertTrue(Post.objects.filter(text='Введенный текст').exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_write_lock_held_only_for_save(self):
+        """Замок записи не берется при показе и проверке формы."""
+        url = reverse('posts:post_edit', args=(self.post.id,))
+        with mock.patch.object(db, 'write_lock') as lock:
+            self.authorized_client.get(url)
+            self.authorized_client.post(url, {'text': ''})
+            lock.__enter__.assert_not_called()
+            self.authorized_client.post(url, {'text': 'new_text'})
+            lock.__enter__.assert_called_once()
+
     def test_author_edit_post(self):
         """При отправке валидной формы происходит изменение поста."""
         posts_count = Post.objects.count()
@@ -69,3 +85,48 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertTrue(Post.objects.filter(text='Изменяем текст').exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+def make_upload(name, image_format, size, mode='RGB', orientation=None):
+    buffer = BytesIO()
+    image = Image.new(mode, size)
+    options = {}
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        options['exif'] = exif.tobytes()
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(IMAGE_MAX_SIDE=200)
+class ImageIngestTests(TestCase):
+    def clean_image(self, upload):
+        form = PostForm({'text': 'test_text'}, {'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return Image.open(form.cleaned_data['image'])
+
+    def test_large_photo_is_normalized(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет метаданные."""
+        image = self.clean_image(make_upload(
+            'photo.jpeg', 'jpeg', (600, 300), orientation=6))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (100, 200))
+        self.assertNotIn('exif', image.info)
+
+    def test_transparent_image_stays_png(self):
+        """Картинка с прозрачностью сохраняется в PNG."""
+        image = self.clean_image(
+            make_upload('logo.png', 'png', (50, 50), mode='RGBA'))
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(image.size, (50, 50))
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_oversized_image_is_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS отклоняется формой."""
+        form = PostForm(
+            {'text': 'test_text'},
+            {'image': make_upload('bomb.png', 'png', (20, 20))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
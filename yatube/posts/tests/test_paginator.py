@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Group, Post, User
+from ..paginator import CursorPage, CursorPaginator
+
+NUMBER_OF_POSTS = 13
+
+
+@override_settings(FEED_PAGINATION='cursor')
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Тестовый пост {i}', group=cls.group)
+            for i in range(NUMBER_OF_POSTS)
+        )
+        # Одинаковая дата: порядок внутри страницы решает id.
+        Post.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def walk(self, url):
+        pages, cursor = [], ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor})
+            page_obj = response.context['page_obj']
+            pages.append(list(page_obj))
+            if not page_obj.has_next():
+                return pages, page_obj
+            cursor = page_obj.next_cursor
+
+    def test_pages_cover_feed_in_order(self):
+        """Курсорные страницы index, group_list, profile идут без пропусков."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for url in urls:
+            with self.subTest(url=url):
+                pages, last_page = self.walk(url)
+                self.assertIsInstance(last_page, CursorPage)
+                self.assertEqual(
+                    [len(page) for page in pages],
+                    [settings.POSTS_PER_PAGE,
+                     NUMBER_OF_POSTS - settings.POSTS_PER_PAGE],
+                )
+                self.assertEqual(sum(pages, []), expected)
+
+    def test_new_post_does_not_shift_next_page(self):
+        """Новый пост не сдвигает следующую страницу."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        Post.objects.create(author=self.author, text='Свежий пост')
+        second = self.client.get(
+            reverse('posts:index'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            len(second), NUMBER_OF_POSTS - settings.POSTS_PER_PAGE)
+        self.assertFalse(set(first) & set(second))
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает ту же первую страницу."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        second = self.client.get(
+            reverse('posts:index'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            reverse('posts:index'), {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_opens_first_page(self):
+        """Подделанный курсор открывает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        page_obj = paginator.get_page('garbage')
+        self.assertEqual(len(page_obj), 5)
+        self.assertFalse(page_obj.has_previous())
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+POSTS_TABLES = (
+    'posts_post', 'posts_comment', 'posts_follow', 'posts_timelineentry',
+)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='test_text',
+            group=cls.group,
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='test_comment')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_views_do_not_scan_tables(self):
+        """Основные запросы страниц идут по индексам, без полного скана."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client.get(url)
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(
+                        table in sql for table in POSTS_TABLES):
+                    continue
+                with self.subTest(url=url, sql=sql):
+                    plan = explain(sql, ())
+                    for step in plan:
+                        self.assertFalse(
+                            step.startswith('SCAN') and 'USING' not in step,
+                            plan,
+                        )
+                        self.assertNotIn('TEMP B-TREE FOR ORDER BY', step)
+
+    def test_follow_is_unique(self):
+        """База не дает создать вторую такую же подписку."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
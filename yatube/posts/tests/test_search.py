@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post, User
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.old = Post.objects.create(
+            author=cls.user, text='Котики и собаки')
+        cls.new = Post.objects.create(
+            author=cls.user, text='Котики и собаки')
+        cls.other = Post.objects.create(author=cls.user, text='Про рыбок')
+        Post.objects.filter(id=cls.old.id).update(
+            pub_date=timezone.now() - timedelta(days=365))
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, [post.id for post in response.context['page_obj']]
+
+    def test_ranked_by_recency_among_equal(self):
+        """Из одинаковых по тексту постов выше более свежий."""
+        _, found = self.search('котик')
+        self.assertEqual(found, [self.new.id, self.old.id])
+
+    def test_index_follows_edits(self):
+        """Индекс следует за правкой и удалением постов."""
+        other = Post.objects.get(id=self.other.id)
+        other.text = 'Про котов'
+        other.save()
+        self.assertEqual(self.search('котов')[1], [self.other.id])
+        self.assertEqual(self.search('рыбок')[1], [])
+        Post.objects.filter(id=self.new.id).delete()
+        self.assertEqual(self.search('котик')[1], [self.old.id])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 из запроса не ломают поиск."""
+        response, found = self.search('"котики" AND (NEAR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(found, [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination(self):
+        """Выдача листается курсором."""
+        response, first = self.search('собаки')
+        page = response.context['page_obj']
+        self.assertTrue(page.has_next())
+        response, second = self.search('собаки', cursor=page.next_cursor)
+        self.assertEqual(first + second, [self.new.id, self.old.id])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_new_posts_do_not_shift_pages(self):
+        """Посты, добавленные после первой страницы, в выдачу не попадают."""
+        response, found = self.search('собаки')
+        late = Post.objects.create(author=self.user, text='Котики и собаки')
+        Post.objects.filter(id=late.id).update(
+            pub_date=timezone.now() - timedelta(days=730))
+        while response.context['page_obj'].has_next():
+            response, page = self.search(
+                'собаки', cursor=response.context['page_obj'].next_cursor)
+            found += page
+        self.assertEqual(found, [self.new.id, self.old.id])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по полнотекстовому индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'рыбок'})
+        self.assertEqual(
+            [post.id for post in response.context['cl'].result_list],
+            [self.other.id],
+        )
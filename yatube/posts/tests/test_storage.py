@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import storage
+from core.models import StoredFile
+
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=b'same image'):
+        return Post.objects.create(
+            author=self.user,
+            text='test_text',
+            image=ContentFile(content, name=name),
+        )
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом под хешем."""
+        first = self.create_post('first.JPG')
+        second = self.create_post('second.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name,
+            r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$',
+        )
+        stored = StoredFile.objects.get(name=first.image.name)
+        self.assertEqual(stored.refcount, 2)
+        self.assertNotEqual(
+            self.create_post('other.jpg', b'other image').image.name,
+            first.image.name,
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последним постом, ссылающимся на него."""
+        first = self.create_post('first.jpg')
+        second = self.create_post('second.jpg')
+        name = first.image.name
+        with mock.patch.object(
+                storage.transaction, 'on_commit', lambda func: func()):
+            first.delete()
+            self.assertTrue(default_storage.exists(name))
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_file_kept_when_referenced_before_commit(self):
+        """Файл не удаляется, если до коммита на него снова сослались."""
+        name = self.create_post('first.jpg').image.name
+        callbacks = []
+        with mock.patch.object(
+                storage.transaction, 'on_commit', callbacks.append):
+            Post.objects.get(image=name).delete()
+        second = self.create_post('second.jpg')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_rehome_media_command(self):
+        """rehome_media переносит старые файлы и сливает дубли."""
+        names = [
+            default_storage.save(f'posts/legacy{i}.png', ContentFile(b'old'))
+            for i in range(3)
+        ]
+        posts = [self.create_post('new.png', b'new') for _ in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(id=post.id).update(image=name)
+        out = StringIO()
+        call_command(
+            'rehome_media', '--batch-size', '2', '--workers', '2', stdout=out)
+        rehomed = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(rehomed), 1)
+        self.assertTrue(storage.is_hashed(rehomed.pop()))
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertIn('Перенесено: 3, без файла: 0.', out.getvalue())
@@ -0,0 +1,244 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images, thumbnails
+from ..models import Post, User
+from ..templatetags import post_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, size=(800, 400)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 0, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='test_text',
+            image=make_image('wide.png'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_request_does_not_build_thumbnail(self):
+        """Страница показывает заглушку и не собирает картинку сама."""
+        with mock.patch.object(images, 'render') as build:
+            response = self.authorized_client.get(reverse('posts:index'))
+        build.assert_not_called()
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+
+    def test_built_variant_replaces_placeholder(self):
+        """После сборки карточка показывает srcset из готовых вариантов."""
+        self.authorized_client.get(reverse('posts:index'))
+        thumbnails.build(self.post.id)
+        self.post.refresh_from_db()
+        variant = thumbnails.get_variant(self.post, 'card')
+        # 960 шире исходника и не собирается.
+        self.assertEqual(
+            [(width, height) for width, height, _ in variant['jpeg']],
+            [(320, 113), (640, 226)],
+        )
+        self.assertEqual(set(variant), set(images.formats()))
+        response = self.authorized_client.get(reverse('posts:index'))
+        small, large = (url for _, _, url in variant['jpeg'])
+        self.assertContains(
+            response, f'srcset="{small} 320w, {large} 640w"')
+        self.assertContains(response, 'width="640" height="226"')
+        self.assertNotContains(response, 'aspect-ratio')
+
+    def test_create_schedules_build_after_commit(self):
+        """Новый пост с картинкой ставит сборку в очередь после коммита."""
+        image = make_image('new.png')
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ), mock.patch.object(thumbnails, 'submit') as submit:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'new_text', 'image': image},
+            )
+        submit.assert_called_once_with(
+            Post.objects.get(text='new_text').id)
+
+    def test_broken_image_is_not_retried(self):
+        """Неудачная сборка запоминается в посте и не повторяется."""
+        with mock.patch.object(images, 'render', side_effect=OSError):
+            with self.assertRaises(OSError):
+                thumbnails.build(self.post.id)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            thumbnails.get_variant(self.post, 'card'), thumbnails.FAILED)
+        with mock.patch.object(post_thumbnails, 'schedule') as schedule:
+            response = self.authorized_client.get(reverse('posts:index'))
+        schedule.assert_not_called()
+        self.assertContains(response, 'aspect-ratio')
+
+    def test_new_image_resets_variants(self):
+        """Замена картинки сбрасывает карту вариантов."""
+        thumbnails.build(self.post.id)
+        post = Post.objects.get(id=self.post.id)
+        self.assertIsNotNone(thumbnails.get_variant(post, 'card'))
+        post.image = make_image('other.png', (600, 600))
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(thumbnails.get_variant(post, 'card'))
+
+    def variant_files(self, post_id):
+        root = os.path.join(TEMP_MEDIA_ROOT, images.variant_dir(post_id))
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), root)
+            for directory, _, names in os.walk(root) for name in names
+        )
+
+    def test_old_variant_files_are_deleted(self):
+        """Файлы вариантов удаляются с заменой картинки и постом."""
+        # Свои картинки: удаление поста освобождает и его файл.
+        post = Post.objects.create(
+            author=self.user, text='own_text',
+            image=make_image('own.png', (700, 300)))
+        thumbnails.build(post.id)
+        old_files = self.variant_files(post.id)
+        self.assertTrue(old_files)
+        post.image = make_image('own_other.png', (500, 500))
+        with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+            post.save()
+            self.assertEqual(self.variant_files(post.id), [])
+            thumbnails.build(post.id)
+            new_files = self.variant_files(post.id)
+            self.assertTrue(new_files)
+            self.assertFalse(set(old_files) & set(new_files))
+            post_id = post.id
+            post.delete()
+        self.assertEqual(self.variant_files(post_id), [])
+
+    def test_rebuild_deletes_dropped_widths(self):
+        """Пересборка удаляет ширины, которых больше нет в настройках."""
+        thumbnails.build(self.post.id)
+        self.assertIn('card-640', ' '.join(self.variant_files(self.post.id)))
+        variants = {
+            name: {**spec, 'widths': spec['widths'][:1]}
+            for name, spec in settings.IMAGE_VARIANTS.items()
+        }
+        with override_settings(IMAGE_VARIANTS=variants):
+            thumbnails.build(self.post.id)
+        self.assertNotIn(
+            'card-640', ' '.join(self.variant_files(self.post.id)))
+
+    def test_size_and_placeholder_saved_with_image(self):
+        """Размеры и превью картинки сохраняются вместе с постом."""
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (800, 400))
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image_placeholder)
+
+    def test_unreadable_image_saved_without_size(self):
+        """Пост с неразборчивой картинкой сохраняется без размеров."""
+        errors = (Image.DecompressionBombError('bomb'), ValueError('mode'))
+        for error in errors:
+            with self.subTest(error=error), mock.patch.object(
+                    images, 'describe', side_effect=error):
+                post = Post.objects.create(
+                    author=self.user,
+                    text='test_text',
+                    image=make_image('bomb.png', (300, 100)),
+                )
+                self.assertIsNone(post.image_width)
+                self.assertEqual(post.image_placeholder, '')
+
+    def test_full_variant_keeps_proportions(self):
+        """Картинка поста на своей странице сохраняет пропорции оригинала."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        with mock.patch.object(images, 'render') as render:
+            response = self.authorized_client.get(url)
+        render.assert_not_called()
+        self.assertContains(response, 'aspect-ratio: 800 / 400')
+        thumbnails.build(self.post.id)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'width="480" height="240"')
+        self.assertContains(response, 'loading="lazy"')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class RebuildThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text='test_text',
+                image=make_image(f'{i}.png', (400 + i, 200)),
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(author=cls.user, text='no_image')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    def rebuild(self):
+        out = StringIO()
+        call_command(
+            'rebuild_thumbnails', '--workers', '0', '--batch-size', '2',
+            '--checkpoint', self.checkpoint, stdout=out,
+        )
+        return out.getvalue()
+
+    def built(self):
+        return [
+            bool(post.variants)
+            for post in Post.objects.filter(
+                id__in=[p.id for p in self.posts]).order_by('id')
+        ]
+
+    def test_rebuilds_all_images(self):
+        """Команда пересобирает варианты всех постов с картинками."""
+        out = self.rebuild()
+        self.assertEqual(self.built(), [True, True, True])
+        self.assertIn('3/3', out)
+        self.assertIn('Пересобрано: 3, ошибок: 0.', out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resumes_after_checkpoint(self):
+        """Команда продолжает с поста после отметки."""
+        with open(self.checkpoint, 'w') as file:
+            file.write(str(self.posts[0].id))
+        out = self.rebuild()
+        self.assertEqual(self.built(), [False, True, True])
+        self.assertIn(f'Продолжение после поста {self.posts[0].id}.', out)
@@ -0,0 +1,152 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='test_text',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+
+    def timeline_posts(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.reader).values_list('post_id', flat=True))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит старые посты автора в ленту."""
+        self.follow()
+        self.assertEqual(self.timeline_posts(), [self.old_post.id])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленту подписчика и на /follow/."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='new_text')
+        self.assertEqual(
+            self.timeline_posts(), [new_post.id, self.old_post.id])
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', '--batch-size', '1', stdout=out)
+        self.assertEqual(self.timeline_posts(), [self.old_post.id])
+        self.assertIn('Лент перестроено: 1', out.getvalue())
+
+
+@override_settings(TIMELINE_CELEBRITY_THRESHOLD=2)
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.fan = User.objects.create_user(username='TestFan')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.celebrity = User.objects.create_user(username='TestCelebrity')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+        cls.posts = [
+            Post.objects.create(author=author, text=f'test_text_{i}')
+            for i, author in enumerate(
+                [cls.author, cls.celebrity, cls.author, cls.celebrity] * 3)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_celebrity_posts_are_not_fanned_out(self):
+        """Посты знаменитости не рассылаются по лентам."""
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.celebrity).exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 6)
+
+    def test_follow_index_merges_sources(self):
+        """follow_index сливает ленту и посты знаменитости по дате."""
+        for pagination in ('page', 'cursor'):
+            with self.subTest(pagination=pagination), override_settings(
+                    FEED_PAGINATION=pagination, POSTS_PER_PAGE=5):
+                page_obj = self.reader_client.get(
+                    reverse('posts:follow_index')).context['page_obj']
+                self.assertEqual(list(page_obj), self.posts[:5])
+                page_param = (
+                    {'page': 2} if pagination == 'page'
+                    else {'cursor': page_obj.next_cursor}
+                )
+                page_obj = self.reader_client.get(
+                    reverse('posts:follow_index'), page_param
+                ).context['page_obj']
+                self.assertEqual(list(page_obj), self.posts[5:10])
+
+    def test_former_celebrity_posts_are_restored(self):
+        """Когда подписчиков становится меньше порога, посты рассылаются."""
+        with mock.patch.object(transaction, 'on_commit', lambda f: f()):
+            Follow.objects.filter(
+                user=self.fan, author=self.celebrity).delete()
+        self.assertFalse(timeline.is_celebrity(self.celebrity.id))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 12)
+        self.assertEqual(
+            timeline.follow_feed(self.reader.id)[:len(self.posts)],
+            self.posts)
+
+    @override_settings(TIMELINE_RESTORE_POSTS=2)
+    def test_restore_is_limited_to_recent_posts(self):
+        """Бывшей знаменитости рассылаются только последние посты."""
+        with mock.patch.object(transaction, 'on_commit', lambda f: f()):
+            Follow.objects.filter(
+                user=self.fan, author=self.celebrity).delete()
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader, author=self.celebrity
+            ).order_by('-pub_date').values_list('post_id', flat=True)),
+            [post.id for post in self.posts
+             if post.author == self.celebrity][:2])
+
+    @override_settings(TIMELINE_CELEBRITY_RELEASE=0.5)
+    def test_celebrity_keeps_flag_above_release(self):
+        """Между порогом и долей RELEASE автор остается знаменитостью."""
+        with mock.patch.object(transaction, 'on_commit', lambda f: f()):
+            Follow.objects.filter(
+                user=self.fan, author=self.celebrity).delete()
+        self.assertTrue(timeline.is_celebrity(self.celebrity.id))
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.celebrity).exists())
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'yatube.jsonl')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='test_title', slug='test_slug', description='test')
+        self.post = Post.objects.create(
+            author=self.author, group=group, text='test_text')
+        self.pub_date = timezone.now() - timedelta(days=30)
+        Post.objects.filter(id=self.post.id).update(pub_date=self.pub_date)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='test_comment')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def run_command(self, name, *args):
+        out = StringIO()
+        call_command(name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_export_import_round_trip(self):
+        """Выгрузка загружается обратно с новыми id и прежними датами."""
+        out = self.run_command('export_yatube', self.path)
+        self.assertIn('Выгружено: 6', out)
+        out = self.run_command(
+            'import_yatube', self.path, '--batch-size', '1')
+        self.assertIn('строк/с', out)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        copy = Post.objects.exclude(id=self.post.id).get()
+        self.assertEqual(copy.pub_date, self.pub_date)
+        self.assertEqual(copy.author, self.author)
+        self.assertEqual(copy.group, self.post.group)
+        self.assertEqual(copy.comments.get().author, self.reader)
+        self.assertEqual(copy.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_import_resumes_after_checkpoint(self):
+        """Загрузка продолжается после строки из отметки."""
+        self.run_command('export_yatube', self.path)
+        offset = Post.objects.latest('id').id
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({
+                'line': 3,
+                'offsets': {'post': offset, 'comment': 100},
+            }, file)
+        out = self.run_command('import_yatube', self.path)
+        self.assertIn('Продолжение после строки 3.', out)
+        self.assertTrue(Post.objects.filter(id=self.post.id + offset))
+        comment = Comment.objects.get(id=101)
+        self.assertEqual(comment.post_id, self.post.id + offset)
+
+    def resume_at(self, line):
+        offset = Post.objects.latest('id').id
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({
+                'line': line,
+                'offsets': {'post': offset, 'comment': 100},
+            }, file)
+        return self.post.id + offset
+
+    def test_replayed_batch_is_skipped(self):
+        """Пачка, записанная до сбоя, при повторе не дублируется."""
+        self.run_command('export_yatube', self.path)
+        post_id = self.resume_at(3)
+        Post.objects.create(
+            id=post_id, author=self.author, group=self.post.group,
+            text='test_text')
+        Post.objects.filter(id=post_id).update(pub_date=self.pub_date)
+        self.run_command('import_yatube', self.path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.get(id=101).post_id, post_id)
+
+    def test_id_conflict_fails(self):
+        """Занятый чужой записью id останавливает загрузку."""
+        self.run_command('export_yatube', self.path)
+        for line, text in ((3, 'live_post'), (2, 'test_text')):
+            with self.subTest(line=line):
+                post_id = self.resume_at(line)
+                Post.objects.create(
+                    id=post_id, author=self.author, group=self.post.group,
+                    text=text)
+                Post.objects.filter(id=post_id).update(
+                    pub_date=self.pub_date)
+                with self.assertRaises(CommandError):
+                    self.run_command('import_yatube', self.path)
+                Post.objects.filter(id=post_id).delete()
@@ -1,13 +1,20 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.http import Http404
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.cache import get_stats, local
+from core.storage import is_hashed
+
+from ..cache import get_author, get_group
 from ..models import Comment, Follow, Group, Post, User
 
 
@@ -28,6 +35,7 @@ class PostsViewsTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostsViewsTest.user)
@@ -158,10 +166,10 @@ class PostsViewsTest(TestCase):
 
     def test_check_cache(self):
         """Проверка кеша."""
+        cache.clear()
         response_1 = self.authorized_client.get(reverse('posts:index'))
         request_1 = response_1.content
-        post_info = Post.objects.get(id=1)
-        post_info.delete()
+        Post.objects.filter(id=self.post.id).update(text='changed_text')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         request_2 = response_2.content
         self.assertTrue(request_1 == request_2)
@@ -170,6 +178,37 @@ class PostsViewsTest(TestCase):
         request_3 = response_3.content
         self.assertTrue(request_1 != request_3)
 
+    def test_cache_invalidated_on_write(self):
+        """Изменения постов, комментариев и групп видны сразу."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        writes = (
+            lambda: Post.objects.get(id=self.post.id).save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='test_comment'),
+            lambda: Group.objects.get(id=self.group.id).save(),
+        )
+        cache.clear()
+        for url in urls:
+            self.authorized_client.get(url)
+        for write in writes:
+            before = get_stats('fragment:index_page')['misses']
+            with mock.patch.object(
+                    transaction, 'on_commit', lambda func: func()):
+                write()
+            for url in urls:
+                with self.subTest(url=url):
+                    self.authorized_client.get(url)
+            self.assertEqual(
+                get_stats('fragment:index_page')['misses'], before + 1)
+        self.authorized_client.get(reverse('posts:index'))
+        local.flush_stats()
+        self.assertGreaterEqual(
+            get_stats('local:fragment:index_page')['hits'], 1)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -193,6 +232,10 @@ class PaginatorViewsTest(TestCase):
         ]
         Post.objects.bulk_create(cls.posts)
 
+    def setUp(self):
+        cache.clear()
+        local.clear()
+
     def test_first_page_contains_ten_records(self):
         """Количество постов на страницах index, group_list, profile
         равно 10.
@@ -232,6 +275,64 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(page_content, COUNT_POSTS_ON_NEXT_PAGE)
 
 
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='test_text')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'comment_{i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        local.clear()
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_comments_loaded_by_cursor(self):
+        """Комментарии показываются пачками, новые первыми."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        page = response.context['comments']
+        self.assertEqual(self.texts(page), ['comment_4', 'comment_3'])
+        self.assertContains(response, 'Комментариев: 5')
+        texts = self.texts(page)
+        while page.has_next():
+            response = self.client.get(
+                reverse('posts:comments', args=(self.post.id,)),
+                {'cursor': page.next_cursor},
+            )
+            page = response.context['comments']
+            texts += self.texts(page)
+        self.assertEqual(texts, [f'comment_{i}' for i in range(4, -1, -1)])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_load_more_without_script(self):
+        """Без скрипта «Показать ещё» открывает страницу поста с курсором."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        cursor = response.context['comments'].next_cursor
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)),
+            {'comments': cursor},
+        )
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            ['comment_2', 'comment_1'],
+        )
+
+    def test_unknown_post(self):
+        """Комментарии несуществующего поста отдают 404."""
+        response = self.client.get(reverse('posts:comments', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
@@ -272,6 +373,7 @@ class PostFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
 
@@ -305,10 +407,10 @@ class PostFormTests(TestCase):
 
     def test_image_in_page(self):
         """Пост с изображением создается в базе данных."""
-        self.assertTrue(
-            Post.objects.filter(
-                text='test_text', image='posts/small.gif').exists()
-        )
+        post = Post.objects.get(text='test_text')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertTrue(is_hashed(post.image.name))
 
 
 class TestFollow(TestCase):
@@ -401,3 +503,301 @@ class TestFollow(TestCase):
         )
         count_follow_new_post = Follow.objects.filter(user=self.user_1).count()
         self.assertNotEqual(count_follow_new_post, count_follow + 1)
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        for i in range(settings.POSTS_PER_PAGE + 3):
+            author = User.objects.create_user(username=f'TestUser{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author, text='test_text', group=cls.group)
+            Post.objects.create(
+                author=cls.author, text='test_text', group=cls.group)
+        cls.post = Post.objects.create(
+            author=cls.author, text='test_text', group=cls.group)
+        for author in User.objects.exclude(id=cls.author.id):
+            Comment.objects.create(
+                post=cls.post, author=author, text='test_comment')
+
+    def setUp(self):
+        cache.clear()
+        local.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_pages_fit_query_budget(self):
+        """Число запросов страницы не зависит от числа постов и комментов."""
+        # group_list, profile и post_detail сначала считают ETag;
+        # группа и автор здесь еще не в кеше объектов.
+        budgets = (
+            (self.guest_client, reverse('posts:index'), 2),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': 'test_slug'}), 4),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': 'TestAuthor'}), 5),
+            (self.guest_client, reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}), 3),
+            (self.authorized_client, reverse('posts:follow_index'), 6),
+        )
+        for client, url, budget in budgets:
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                client.get(url)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='test_text',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        local.clear()
+
+    def test_card_rendered_once_for_all_feeds(self):
+        """Карточка поста рендерится один раз для всех лент."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for url in urls:
+            response = self.client.get(url)
+            self.assertContains(response, 'test_text')
+        self.assertEqual(get_stats('post_card')['misses'], 1)
+        self.assertEqual(get_stats('post_card')['hits'], 2)
+
+    def test_edited_post_card_is_rendered_again(self):
+        """После правки поста карточка рендерится заново."""
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'changed_text'
+        post.save()
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'}))
+        self.assertContains(response, 'changed_text')
+        self.assertEqual(get_stats('post_card')['misses'], 2)
+
+    def test_rename_renders_only_author_cards(self):
+        """Переименование рендерит заново только карточки автора."""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='other_text')
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(get_stats('post_card')['misses'], 2)
+        user = User.objects.get(id=self.user.id)
+        user.username = 'renamed'
+        with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+            other.save()
+            user.save()
+        for username in ('renamed', 'other'):
+            self.client.get(
+                reverse('posts:profile', kwargs={'username': username}))
+        self.assertEqual(get_stats('post_card')['misses'], 3)
+        self.assertEqual(get_stats('post_card')['hits'], 1)
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='test_text',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        local.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный анонимный запрос отдается из кеша страниц."""
+        first = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            set(first['Surrogate-Key'].split()),
+            {'index', 'group:test_slug', 'author:auth',
+             f'post:{self.post.id}'},
+        )
+        second = self.client.get(reverse('posts:index'))
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(get_stats('page')['hits'], 1)
+
+    def test_authorized_page_is_not_cached(self):
+        """Страницы вошедших пользователей в кеш страниц не попадают."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn('Surrogate-Key', response)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+
+    def test_writes_purge_tagged_pages(self):
+        """Записи сбрасывают страницы с ключами затронутых объектов."""
+        follower = User.objects.create_user(username='follower')
+        cases = (
+            (reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+             lambda: Comment.objects.create(
+                 post=self.post, author=self.user, text='test_comment')),
+            (reverse('posts:index'),
+             lambda: Group.objects.filter(id=self.group.id).first().save()),
+            (reverse('posts:profile', kwargs={'username': 'auth'}),
+             lambda: Follow.objects.create(user=follower, author=self.user)),
+            (reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+             lambda: Post.objects.create(
+                 author=follower, text='new_text', group=self.group)),
+        )
+        for url, write in cases:
+            with self.subTest(url=url):
+                self.client.get(url)
+                self.assertIsNone(self.client.get(url).context)
+                purges = get_stats('page')['purges']
+                with mock.patch.object(
+                        transaction, 'on_commit', lambda func: func()):
+                    write()
+                self.assertGreater(get_stats('page')['purges'], purges)
+                self.assertIsNotNone(self.client.get(url).context)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='test_text',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        local.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_page_returns_304(self):
+        """Неизменная страница отвечает 304 без рендера шаблона."""
+        for client in (self.client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    etag = client.get(url)['ETag']
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertIsNone(response.context)
+                    self.assertIn('Cookie', response['Vary'])
+
+    def test_variants_have_own_etag(self):
+        """Гость и вошедший пользователь получают разные ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'],
+                    self.authorized_client.get(url)['ETag'],
+                )
+
+    def test_pages_have_no_last_modified(self):
+        """Страницы проверяются только по ETag, без Last-Modified."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertFalse(
+                    self.client.get(url).has_header('Last-Modified'))
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag поста и лент."""
+        before = [self.authorized_client.get(url)['ETag'] for url in self.urls]
+        with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+            Comment.objects.create(
+                post=self.post, author=self.user, text='test_comment')
+        for url, etag in zip(self.urls, before):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+class HotObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='test_title',
+            slug='test_slug',
+            description='test_description',
+        )
+
+    def test_lookups_are_free_when_hot(self):
+        """Повторный поиск группы и автора не ходит в базу."""
+        self.assertEqual(get_group('test_slug'), self.group)
+        self.assertEqual(get_author('auth'), self.user)
+        with self.assertNumQueries(0):
+            get_group('test_slug')
+            get_author('auth')
+
+    def test_save_evicts_object(self):
+        """Сохранение группы и пользователя сразу видно в кеше."""
+        get_group('test_slug')
+        get_author('auth')
+        group = Group.objects.get(id=self.group.id)
+        group.title = 'new_title'
+        user = User.objects.get(id=self.user.id)
+        user.first_name = 'new_name'
+        with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+            group.save()
+            user.save()
+        self.assertEqual(get_group('test_slug').title, 'new_title')
+        self.assertEqual(get_author('auth').first_name, 'new_name')
+
+    def test_rename_evicts_old_username(self):
+        """После переименования старое имя не находит автора."""
+        cache.clear()
+        local.clear()
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        self.client.get(url)
+        self.assertIsNone(self.client.get(url).context)
+        self.assertEqual(get_author('auth'), self.user)
+        user = User.objects.get(id=self.user.id)
+        user.username = 'renamed'
+        with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+            user.save()
+        with self.assertRaises(Http404):
+            get_author('auth')
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,104 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.db import serialized_write
+
+from . import cache as feed_cache
+from . import images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Неудачная попытка запоминается в посте, чтобы битый файл не ставился
+# в очередь при каждом показе заглушки. Новая картинка сбрасывает отметку.
+FAILED = ''
+
+executor = None
+pending = set()
+lock = threading.Lock()
+
+
+def get_variant(post, name):
+    """Готовые файлы варианта, FAILED или None, если их еще нет.
+
+    Карта вариантов читается из той же строки, что и пост, поэтому
+    страница из N постов не делает N запросов к кешу.
+    """
+    if not post.variants:
+        return None
+    return json.loads(post.variants).get(name)
+
+
+def schedule(post):
+    """Поставить сборку вариантов картинки в очередь после коммита."""
+    if post.image:
+        transaction.on_commit(lambda: submit(post.id))
+
+
+def submit(post_id):
+    global executor
+    if not settings.THUMBNAIL_ASYNC:
+        build_logged(post_id)
+        return
+    with lock:
+        if post_id in pending:
+            return
+        pending.add(post_id)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+    executor.submit(work, post_id)
+
+
+def work(post_id):
+    try:
+        build_logged(post_id)
+    finally:
+        with lock:
+            pending.discard(post_id)
+        connections.close_all()
+
+
+def build_logged(post_id):
+    try:
+        build(post_id)
+    except Exception:
+        logger.exception('Не удалось собрать миниатюры поста %s', post_id)
+        return False
+    return True
+
+
+def build(post_id):
+    """Собрать все варианты из IMAGE_VARIANTS и обновить карточку."""
+    post = Post.objects.filter(id=post_id).select_related('author').first()
+    if post is None or not post.image:
+        return
+    variants, paths = {}, set()
+    try:
+        for name, spec in settings.IMAGE_VARIANTS.items():
+            variants[name], written = images.render(post, name, spec)
+            paths.update(written)
+    except Exception:
+        store(post, dict.fromkeys(settings.IMAGE_VARIANTS, FAILED))
+        raise
+    if store(post, variants):
+        # Файлы прежних картинок и ширин, которых больше нет в
+        # IMAGE_VARIANTS, не нужны ни одной карточке.
+        images.delete_variants(post.id, keep=paths)
+        # Карточка с заглушкой уже в кеше: новая отметка updated дает ей
+        # новый ключ, а сброс лент и страниц показывает готовую картинку.
+        feed_cache.bump_post(post)
+        feed_cache.purge_post(post)
+
+
+@serialized_write
+def store(post, variants):
+    """Записать карту вариантов, если картинка поста не сменилась."""
+    return Post.objects.filter(id=post.id, image=post.image.name).update(
+        variants=json.dumps(variants), updated=timezone.now())
@@ -0,0 +1,248 @@
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core.db import serialized_write
+
+from . import cache
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import FeedSource, MergedFeed
+
+logger = logging.getLogger(__name__)
+
+executor = None
+pending = set()
+lock = threading.Lock()
+
+
+def bulk_insert(entries, batch_size=None):
+    """Вставить строки ленты пачками, пропуская уже существующие."""
+    batch_size = batch_size or settings.TIMELINE_BATCH_SIZE
+    entries = iter(entries)
+    inserted = 0
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return inserted
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        inserted += len(batch)
+
+
+def is_celebrity(author_id):
+    """Авторам с большим числом подписчиков лента не рассылается."""
+    return UserStats.objects.filter(
+        user_id=author_id, celebrity=True).exists()
+
+
+def release_count():
+    """Меньше стольких подписчиков знаменитость перестает ею быть."""
+    return math.ceil(
+        settings.TIMELINE_CELEBRITY_THRESHOLD
+        * settings.TIMELINE_CELEBRITY_RELEASE)
+
+
+def promote(author_id):
+    """Отметить автора знаменитостью, если он дорос до порога."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        celebrity=False,
+        followers_count__gte=settings.TIMELINE_CELEBRITY_THRESHOLD,
+    ).update(celebrity=True)
+
+
+def is_demoted(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        celebrity=True,
+        followers_count__lt=release_count(),
+    ).exists()
+
+
+def demote(author_id):
+    """Поставить рассылку постов бывшей знаменитости в очередь."""
+    if is_demoted(author_id):
+        transaction.on_commit(lambda: submit(author_id))
+
+
+def celebrity_ids(user_id):
+    """Авторы-знаменитости среди подписок пользователя."""
+    return list(UserStats.objects.filter(
+        user_id__in=Follow.objects.filter(
+            user_id=user_id).values('author_id'),
+        celebrity=True,
+    ).values_list('user_id', flat=True))
+
+
+def follow_feed(user_id):
+    """Лента подписок: строки ленты плюс посты знаменитостей при чтении."""
+    celebrities = celebrity_ids(user_id)
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    if celebrities:
+        entries = entries.exclude(author_id__in=celebrities)
+    return MergedFeed(
+        FeedSource(
+            entries.select_related('post__author', 'post__group'),
+            keys=('pub_date', 'post_id'),
+            attr='post',
+        ),
+        *(FeedSource(Post.objects.filter(
+            author_id=author_id).select_related('author', 'group'))
+          for author_id in celebrities),
+    )
+
+
+def fan_out(post):
+    """Добавить новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return 0
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    return bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id, batch_size=None):
+    """Перенести посты автора в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return 0
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    return bulk_insert(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size,
+    )
+
+
+def submit(author_id):
+    global executor
+    if not settings.TIMELINE_ASYNC:
+        restore_logged(author_id)
+        return
+    with lock:
+        if author_id in pending:
+            return
+        pending.add(author_id)
+        if executor is None:
+            executor = ThreadPoolExecutor(1, thread_name_prefix='timeline')
+    executor.submit(work, author_id)
+
+
+def work(author_id):
+    try:
+        restore_logged(author_id)
+    finally:
+        with lock:
+            pending.discard(author_id)
+        connections.close_all()
+
+
+def restore_logged(author_id):
+    try:
+        return restore(author_id)
+    except Exception:
+        logger.exception(
+            'Не удалось разослать посты автора %s', author_id)
+        return None
+
+
+@serialized_write
+def clear_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id, celebrity=True).update(celebrity=False)
+
+
+@serialized_write
+def insert_batch(batch):
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def restore(author_id, limit=None, batch_size=None):
+    """Разослать последние посты автора, переставшего быть знаменитостью.
+
+    Пока автор был знаменитостью, его посты не рассылались, и без этого
+    они пропали бы из лент подписчиков. Рассылаются только limit
+    последних постов, каждая пачка пишется отдельно. Флаг снимается до
+    рассылки: новые посты и подписки с этого момента расходятся сами,
+    а подписчики читаются уже после него, так что никто не выпадает.
+    """
+    if not is_demoted(author_id) or not clear_celebrity(author_id):
+        return 0
+    limit = limit or settings.TIMELINE_RESTORE_POSTS
+    batch_size = batch_size or settings.TIMELINE_BATCH_SIZE
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')[:limit])
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+    entries = (
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id in follower_ids
+        for post_id, pub_date in posts
+    )
+    inserted = 0
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            break
+        insert_batch(batch)
+        inserted += len(batch)
+    # Закешированные ленты подписок зависят от профилей их авторов.
+    cache.bump(cache.profile_scope(author_id))
+    return inserted
+
+
+def trim(user_id, author_id):
+    """Убрать посты автора из ленты отписавшегося пользователя."""
+    return TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()[0]
+
+
+def rebuild(user_id, batch_size=None):
+    """Собрать ленту пользователя заново по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=celebrity_ids(user_id)
+    ).values_list('id', 'author_id', 'pub_date').distinct()
+    return bulk_insert(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts.iterator()
+        ),
+        batch_size,
+    )
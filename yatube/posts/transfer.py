@@ -0,0 +1,76 @@
+import json
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+# Выгрузка — JSON Lines, одна строка на запись, в порядке зависимостей.
+# На пользователей и группы строки ссылаются по username и slug, на
+# посты — по id выгрузки.
+EXPORTS = (
+    ('user', User.objects.values(
+        'username', 'first_name', 'last_name', 'email', 'password',
+        'is_active', 'date_joined',
+    )),
+    ('group', Group.objects.values('title', 'slug', 'description')),
+    ('post', Post.objects.values(
+        'id', 'text', 'pub_date', 'updated', 'image', 'image_width',
+        'image_height', 'image_placeholder', 'variants',
+        author_username=F('author__username'),
+        group_slug=F('group__slug'),
+    )),
+    ('comment', Comment.objects.values(
+        'id', 'post_id', 'text', 'created',
+        author_username=F('author__username'),
+    )),
+    ('follow', Follow.objects.values(
+        user_username=F('user__username'),
+        author_username=F('author__username'),
+    )),
+)
+DATES = {
+    'user': ('date_joined',),
+    'post': ('pub_date', 'updated'),
+    'comment': ('created',),
+}
+
+
+def export_rows(chunk_size):
+    """Все записи в порядке зависимостей; память ограничена chunk_size."""
+    for model, queryset in EXPORTS:
+        for row in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+            yield model, row
+
+
+def dumps(model, row):
+    return json.dumps({'model': model, **row}, default=str,
+                      ensure_ascii=False)
+
+
+def loads(line):
+    """Модель и поля строки выгрузки; даты разобраны."""
+    row = json.loads(line)
+    model = row.pop('model')
+    for name in DATES.get(model, ()):
+        row[name] = parse_datetime(row[name])
+    return model, row
+
+
+@contextmanager
+def keep_dates(*models):
+    """Сохранять даты из выгрузки в полях с auto_now и auto_now_add."""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
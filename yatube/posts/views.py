@@ -1,15 +1,34 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.views.decorators.vary import vary_on_cookie
+
+from core.db import serialized_write
+from core.routers import read_from_replica
+
+from . import thumbnails
+from .cache import (INDEX, INDEX_KEY, author_key, feed_version,
+                    follow_version, get_author, get_group, group_key,
+                    group_scope, post_key, profile_scope, tag_page)
+from .conditional import (conditional, group_validator, post_validator,
+                          profile_validator)
+from .counters import get_stats, load_stats
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Post, User
+from .paginator import CursorPaginator
+from .search import SearchPaginator
+from .timeline import follow_feed
 
 
 def get_page_context(request, queryset):
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
+    if settings.FEED_PAGINATION == 'cursor':
+        paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+        page_number = request.GET.get('cursor')
+    else:
+        paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+        page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {
         'paginator': paginator,
@@ -18,44 +37,67 @@ def get_page_context(request, queryset):
     }
 
 
+@read_from_replica
 def index(request):
     """Главная страница."""
-    context = get_page_context(request, Post.objects.all())
-    return render(request, 'posts/index.html', context)
+    context = get_page_context(
+        request, Post.objects.select_related('author', 'group'))
+    context['feed_version'] = feed_version(INDEX)
+    response = render(request, 'posts/index.html', context)
+    return tag_page(request, response, context['page_obj'], INDEX_KEY)
 
 
+@read_from_replica
+@vary_on_cookie
+@conditional(group_validator)
 def group_posts(request, slug):
     """Страница публикаций по группам."""
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group(slug)
     context = {
         'group': group,
+        'feed_version': feed_version(group_scope(group.id)),
     }
-    context.update(get_page_context(request, group.posts.all()))
-    return render(request, 'posts/group_list.html', context)
+    context.update(get_page_context(
+        request, group.posts.select_related('author', 'group')))
+    response = render(request, 'posts/group_list.html', context)
+    return tag_page(
+        request, response, context['page_obj'], group_key(group.slug))
 
 
+@read_from_replica
+@vary_on_cookie
+@conditional(profile_validator)
 def profile(request, username):
     """Страница профиля пользователя."""
-    author = get_object_or_404(User, username=username)
-    post_quantity = author.posts.all().count
+    author = get_author(username)
+    stats = load_stats(author)
     following = request.user.username and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
         'author': author,
-        'post_quantity': post_quantity,
+        'stats': stats,
+        'post_quantity': stats.posts_count,
         'following': following,
+        'feed_version': feed_version(profile_scope(author.id)),
     }
-    context.update(get_page_context(request, author.posts.all()))
-    return render(request, 'posts/profile.html', context)
+    context.update(get_page_context(
+        request, author.posts.select_related('author', 'group')))
+    response = render(request, 'posts/profile.html', context)
+    return tag_page(
+        request, response, context['page_obj'], author_key(author.username))
 
 
+@read_from_replica
+@vary_on_cookie
+@conditional(post_validator)
 def post_detail(request, post_id):
     """Страница конкретного поста."""
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, id=post.author_id)
-    comments = post.comments.all()
-    post_quantity = author.posts.all().count
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    author = post.author
+    comments = get_comments_page(post.id, request.GET.get('comments'))
+    post_quantity = get_stats(author).posts_count
     context = {
         'post': post,
         'author': author,
@@ -63,7 +105,53 @@ def post_detail(request, post_id):
         'form': form,
         'comments': comments,
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    return tag_page(request, response, [post], *(
+        author_key(comment.author.username) for comment in comments))
+
+
+def get_comments_page(post_id, cursor):
+    """Страница комментариев поста, новые первыми, по курсору (created, id)."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        keys=('created', 'id'),
+    )
+    return paginator.get_page(cursor)
+
+
+@read_from_replica
+def post_comments(request, post_id):
+    """HTML следующей пачки комментариев для «Показать ещё»."""
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(post_id, request.GET.get('cursor'))
+    context = {'comments': comments, 'post_id': post_id}
+    response = render(request, 'posts/includes/comment_list.html', context)
+    return tag_page(request, response, [], post_key(post_id), *(
+        author_key(comment.author.username) for comment in comments))
+
+
+@read_from_replica
+def search(request):
+    """Поиск по тексту постов."""
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, settings.POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('cursor')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@serialized_write
+@transaction.atomic
+def save_form(form):
+    """Сохранить проверенную форму под замком записи.
+
+    Замок не держится ни при показе формы, ни при ее проверке, где
+    картинка пересжимается, ни при рендеринге ответа.
+    """
+    return form.save()
 
 
 @login_required
@@ -75,9 +163,9 @@ def post_create(request):
     )
     if not form.is_valid():
         return render(request, 'posts/create_post.html', {'form': form})
-    new_post = form.save(commit=False)
-    new_post.author = request.user
-    form.save()
+    form.instance.author = request.user
+    new_post = save_form(form)
+    thumbnails.schedule(new_post)
     return redirect('posts:profile', new_post.author)
 
 
@@ -99,7 +187,9 @@ def post_edit(request, post_id):
             'is_edit': True,
         }
         return render(request, 'posts/create_post.html', context)
-    form.save()
+    save_form(form)
+    if 'image' in form.changed_data:
+        thumbnails.schedule(post)
     return redirect('posts:post_detail', post_id)
 
 
@@ -109,22 +199,24 @@ def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        form.instance.author = request.user
+        form.instance.post = post
+        save_form(form)
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
     """Посты авторов, на которых подписан текущий пользователь."""
-    context = get_page_context(request, Post.objects.filter(
-        author__following__user=request.user))
+    context = get_page_context(request, follow_feed(request.user.id))
+    context['feed_version'] = follow_version(request.user.id)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@serialized_write
+@transaction.atomic
 def profile_follow(request, username):
     """Подписка на автора."""
     author = get_object_or_404(User, username=username)
@@ -137,6 +229,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@serialized_write
+@transaction.atomic
 def profile_unfollow(request, username):
     """Отписка от автора."""
     author = get_object_or_404(User, username=username)
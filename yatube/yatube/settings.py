@@ -38,7 +38,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -69,8 +71,35 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Реплика для проверки на одной машине: копию основной базы делает
+    # manage.py sync_replicas. В тестах это зеркало default.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Базы, с которых читают ленты; пустой список — все из default.
+DATABASE_REPLICAS = []
+# После записи пользователь читает из default столько секунд.
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = 10
+
+# Прагмы для каждого соединения с SQLite: WAL не дает читателям мешать
+# писателю, busy_timeout — сколько миллисекунд ждать чужую запись,
+# отрицательный cache_size задан в килобайтах.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
 }
+# Запись, упершаяся в блокировку, повторяется с растущей паузой.
+SQLITE_WRITE_RETRIES = 5
+SQLITE_RETRY_DELAY = 0.05
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,15 +144,90 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Один файл на все рабочие процессы: сброс в одном виден остальным.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+# Тесты переносят файлы кешей из CACHES во временный каталог.
+TEST_RUNNER = 'core.runner.TemporaryCacheRunner'
+FEED_CACHE_TIMEOUT = 300
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Страницы для анонимных читателей; 0 выключает кеш страниц.
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Уровень в памяти процесса: записи быстро стареют, чтобы сброс в другом
+# рабочем процессе был виден не позже чем через LOCAL_CACHE_TIMEOUT.
+LOCAL_CACHE_SIZE = 500
+LOCAL_CACHE_TIMEOUT = 5
+LOCAL_STATS_FLUSH = 100
+OBJECT_CACHE_TIMEOUT = 60 * 60
+# Защита от одновременного пересчета: пока один процесс держит аренду,
+# остальные отдают устаревшее значение, хранимое CACHE_STALE_TIMEOUT
+# после срока.
+CACHE_LEASE_TIMEOUT = 30
+CACHE_LEASE_WAIT = 2
+CACHE_STALE_TIMEOUT = 60 * 5
+CACHE_XFETCH_BETA = 1.0
+
+
+# Загрузки пишутся во временный файл, а не копятся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
 
 # CONSTANT
 
 POSTS_PER_PAGE = 10
+# Комментарии на странице поста и в каждой догрузке «Показать ещё».
+COMMENTS_PER_PAGE = 20
+# 'page' — номера страниц, 'cursor' — курсор по (pub_date, id).
+# Ленту подписок со знаменитостями стоит листать курсором: в режиме
+# 'page' дальние страницы читают из каждого источника все строки до них.
+FEED_PAGINATION = 'page'
 NUMBER_OF_SYMBOLS_IN_SLUG = 100
+# Поиск: пост возрастом SEARCH_RECENCY_DAYS ранжируется вдвое ниже
+# нового с тем же текстом; из запроса берется SEARCH_MAX_TERMS слов.
+SEARCH_RECENCY_DAYS = 30
+SEARCH_MAX_TERMS = 8
 NUMBER_OF_SYMBOLS_IN_POST = 15
+TIMELINE_BATCH_SIZE = 500
+# Варианты картинки поста: пропорции size (None — как у оригинала),
+# набор ширин для srcset и sizes для браузера. Собираются в фоне после
+# сохранения поста, шаблоны берут только готовые.
+IMAGE_VARIANTS = {
+    'card': {
+        'size': (960, 339),
+        'widths': (320, 640, 960),
+        'sizes': '(max-width: 992px) 100vw, 960px',
+    },
+    'full': {
+        'size': None,
+        'widths': (480, 960, 1440),
+        'sizes': '(max-width: 768px) 100vw, 75vw',
+    },
+}
+IMAGE_QUALITY = 80
+# Загрузка приводится к оригиналу не больше IMAGE_MAX_SIDE по длинной
+# стороне; картинки больше IMAGE_MAX_PIXELS отклоняются по заголовку.
+IMAGE_MAX_SIDE = 2048
+IMAGE_MAX_PIXELS = 40_000_000
+# Длинная сторона превью, которое встраивается в страницу до загрузки.
+IMAGE_PLACEHOLDER_SIZE = 16
+# В отладке варианты собираются сразу после коммита, без фоновых потоков.
+THUMBNAIL_ASYNC = not DEBUG
+THUMBNAIL_WORKERS = 2
+# Посты авторов с таким числом подписчиков не рассылаются по лентам,
+# а подмешиваются в follow_index при чтении. Знаменитостью автор
+# перестает быть, только опустившись ниже доли RELEASE от порога, чтобы
+# колебания у порога не запускали рассылку снова и снова.
+TIMELINE_CELEBRITY_THRESHOLD = 10000
+TIMELINE_CELEBRITY_RELEASE = 0.9
+# Бывшей знаменитости рассылаются в фоне только последние посты.
+TIMELINE_RESTORE_POSTS = 100
+TIMELINE_ASYNC = not DEBUG